@@ -1,33 +1,57 @@
 import tkinter as tk
-from tkinter import ttk
-import random
+from tkinter import filedialog, ttk
+import sys
 import threading
 import time
 
+from montecarlo import monte_carlo_eta
+from queue_engine import QueueEngine
+from replay import Playback, ReplayTrace
+from snapshots import SnapshotChannel
+from truck import TruckState
+
+# Truck colours, derived from the truck state only when drawing
+STATE_COLORS = {TruckState.MOVING: "blue", TruckState.STATIC: "red", TruckState.COUNTDOWN: "red"}
+
+# How often the UI checks for a new simulation snapshot
+FRAME_INTERVAL_MS = 50
+
+# Replay playback speeds offered, in ticks per second of wall-clock time
+PLAYBACK_SPEEDS = ("1", "2", "5", "10", "20", "50", "100", "500", "1000")
+
 class BorderQueueSimulator:
     def __init__(self, root):
         self.root = root
         self.root.title("Border Queue Visualizer with ETA")
         self.root.geometry("1200x800")
-        
-        # Simulation parameters
-        self.max_queue_length = 50
-        self.move_interval = 5  # seconds
-        self.static_trucks_count = 3
-        self.static_duration_periods = 4
-        self.initial_trucks_to_pass = 0
+
+        # Headless engine holding the simulation parameters and queue state
+        self.engine = QueueEngine(max_queue_length=50, move_interval=5,
+                                  static_trucks_count=3, static_duration_periods=4)
         self.queue_length_threshold = 3
-        
-        # Queue state
-        self.trucks = []
+
+        # Simulation thread state: the thread steps the engine under engine_lock and
+        # publishes an immutable snapshot per tick; the UI renders the newest one
         self.running = False
         self.simulation_thread = None
-        self.time_elapsed = 0
-        self.trucks_crossed = 0
-        
+        self.stop_event = threading.Event()
+        self.engine_lock = threading.Lock()
+        self.snapshots = SnapshotChannel()
+        self.snapshot = self.engine.snapshot()
+        # Shown by the first poll, so the views are filled before the first tick
+        self.snapshots.publish(self.snapshot)
+        # Monte Carlo ETA reports, handed from their worker thread to the UI the same way
+        self.mc_reports = SnapshotChannel()
+
+        # Recorded run being replayed instead of the live engine, if any
+        self.replay = None
+        self.playback = None
+        self.replay_shown_tick = None
+        self.last_frame_time = time.perf_counter()
+
         self.setup_ui()
-        self.initialize_queue()
-        
+        self.root.after(FRAME_INTERVAL_MS, self.poll_snapshots)
+
     def setup_ui(self):
         # Control Panel
         control_frame = ttk.Frame(self.root, padding="10")
@@ -39,22 +63,22 @@ class BorderQueueSimulator:
         
         # Max queue length
         ttk.Label(params_frame, text="Maximum Queue Length:").grid(row=0, column=0, sticky=tk.W, padx=5)
-        self.max_length_var = tk.StringVar(value=str(self.max_queue_length))
+        self.max_length_var = tk.StringVar(value=str(self.engine.max_queue_length))
         ttk.Entry(params_frame, textvariable=self.max_length_var, width=10).grid(row=0, column=1, padx=5)
         
         # Move interval
         ttk.Label(params_frame, text="Move Interval (seconds):").grid(row=0, column=2, sticky=tk.W, padx=5)
-        self.interval_var = tk.StringVar(value=str(self.move_interval))
+        self.interval_var = tk.StringVar(value=str(self.engine.move_interval))
         ttk.Entry(params_frame, textvariable=self.interval_var, width=10).grid(row=0, column=3, padx=5)
         
         # Static trucks count
         ttk.Label(params_frame, text="Static Trucks Count:").grid(row=1, column=0, sticky=tk.W, padx=5)
-        self.static_count_var = tk.StringVar(value=str(self.static_trucks_count))
+        self.static_count_var = tk.StringVar(value=str(self.engine.static_trucks_count))
         ttk.Entry(params_frame, textvariable=self.static_count_var, width=10).grid(row=1, column=1, padx=5)
         
         # Static duration periods
         ttk.Label(params_frame, text="Static Duration (periods):").grid(row=1, column=2, sticky=tk.W, padx=5)
-        self.static_duration_var = tk.StringVar(value=str(self.static_duration_periods))
+        self.static_duration_var = tk.StringVar(value=str(self.engine.static_duration_periods))
         ttk.Entry(params_frame, textvariable=self.static_duration_var, width=10).grid(row=1, column=3, padx=5)
         
         # Control buttons
@@ -65,6 +89,30 @@ class BorderQueueSimulator:
         ttk.Button(button_frame, text="Stop Simulation", command=self.stop_simulation).pack(side=tk.LEFT, padx=5)
         ttk.Button(button_frame, text="Reset Queue", command=self.reset_queue).pack(side=tk.LEFT, padx=5)
         ttk.Button(button_frame, text="Apply Settings", command=self.apply_settings).pack(side=tk.LEFT, padx=5)
+        ttk.Button(button_frame, text="Monte Carlo ETA", command=self.start_monte_carlo_eta).pack(side=tk.LEFT, padx=5)
+        
+        # Replay controls: scrub a recorded run at any speed, independent of move_interval
+        replay_frame = ttk.LabelFrame(control_frame, text="Replay", padding="10")
+        replay_frame.pack(fill=tk.X, pady=5)
+        
+        ttk.Button(replay_frame, text="Open Replay...", command=self.choose_replay).pack(side=tk.LEFT, padx=5)
+        ttk.Button(replay_frame, text="Play/Pause", command=self.toggle_playback).pack(side=tk.LEFT, padx=5)
+        ttk.Button(replay_frame, text="<", width=3, command=lambda: self.step_replay(-1)).pack(side=tk.LEFT)
+        ttk.Button(replay_frame, text=">", width=3, command=lambda: self.step_replay(1)).pack(side=tk.LEFT)
+        
+        ttk.Label(replay_frame, text="Speed (ticks/s):").pack(side=tk.LEFT, padx=5)
+        self.speed_var = tk.StringVar(value="10")
+        speed_box = ttk.Combobox(replay_frame, textvariable=self.speed_var, values=PLAYBACK_SPEEDS, width=6)
+        speed_box.pack(side=tk.LEFT)
+        speed_box.bind("<<ComboboxSelected>>", lambda event: self.set_playback_speed())
+        speed_box.bind("<Return>", lambda event: self.set_playback_speed())
+        
+        self.replay_tick_var = tk.DoubleVar(value=0)
+        self.replay_scale = ttk.Scale(replay_frame, from_=0, to=0, variable=self.replay_tick_var,
+                                      command=lambda value: self.seek_replay(float(value)))
+        self.replay_scale.pack(side=tk.LEFT, fill=tk.X, expand=True, padx=10)
+        self.replay_status_var = tk.StringVar(value="No replay loaded")
+        ttk.Label(replay_frame, textvariable=self.replay_status_var).pack(side=tk.LEFT, padx=5)
         
         # Status display
         self.status_var = tk.StringVar(value="Ready to start simulation")
@@ -80,13 +128,24 @@ class BorderQueueSimulator:
         self.eta_var = tk.StringVar(value="Last Truck ETA: Calculating...")
         ttk.Label(time_frame, textvariable=self.eta_var).pack(side=tk.LEFT, padx=10)
         
+        self.mc_eta_var = tk.StringVar(value="")
+        ttk.Label(time_frame, textvariable=self.mc_eta_var).pack(side=tk.LEFT, padx=10)
+        
         # Visualization area
         viz_frame = ttk.LabelFrame(self.root, text="Queue Visualization", padding="10")
         viz_frame.pack(fill=tk.BOTH, expand=True, padx=10, pady=5)
         
-        # Canvas for drawing the queue
+        # Canvas for drawing the queue; items persist between frames and only the
+        # slots scrolled into view are drawn
         self.canvas = tk.Canvas(viz_frame, bg="white", height=300)
+        canvas_scrollbar = ttk.Scrollbar(viz_frame, orient="horizontal", command=self.scroll_canvas)
+        self.canvas.configure(xscrollcommand=canvas_scrollbar.set)
         self.canvas.pack(fill=tk.BOTH, expand=True)
+        canvas_scrollbar.pack(fill=tk.X)
+        self.canvas.bind("<Configure>", lambda event: self.draw_queue())
+        self.canvas_layout = None
+        self.slot_items = {}
+        self.truck_items = {}
         
         # Legend
         legend_frame = ttk.Frame(viz_frame)
@@ -125,61 +184,16 @@ class BorderQueueSimulator:
         details_frame = ttk.LabelFrame(self.root, text="Truck Details", padding="10")
         details_frame.pack(fill=tk.X, padx=10, pady=5)
         
-        self.details_text = tk.Text(details_frame, height=6, wrap=tk.WORD)
-        scrollbar = ttk.Scrollbar(details_frame, orient="vertical", command=self.details_text.yview)
-        self.details_text.configure(yscrollcommand=scrollbar.set)
-        self.details_text.pack(side=tk.LEFT, fill=tk.BOTH, expand=True)
-        scrollbar.pack(side=tk.RIGHT, fill=tk.Y)
-    
-    def initialize_queue(self):
-        """Initialize the truck queue with position-dependent static durations"""
-        self.trucks = []
-        self.time_elapsed = 0
-        self.trucks_crossed = 0
-        
-        for i in range(self.max_queue_length):
-            truck = {
-                'id': i + 1,
-                'position': i,
-                'is_static': False,
-                'static_remaining': 0,
-                'original_position': i,
-                'wait_time': 0,
-                'color': 'blue',
-                'countdown_active': False
-            }
-            self.trucks.append(truck)
-        
-        # Randomly assign static trucks with position-dependent durations
-        static_indices = random.sample(range(self.max_queue_length), 
-                                     min(self.static_trucks_count, self.max_queue_length))
-        
-        # Define threshold for "near" vs "far" trucks
-        position_threshold = self.max_queue_length // 2
-        
-        for idx in static_indices:
-            self.trucks[idx]['is_static'] = True
-            self.trucks[idx]['countdown_active'] = False
-            self.trucks[idx]['color'] = 'red'
-            # Shorter duration for trucks near border (lower positions)
-            if idx <= position_threshold:
-                self.trucks[idx]['static_remaining'] = random.randint(1, max(1, self.static_duration_periods // 1.5))
-            # Longer duration for trucks far from border (higher positions)
-            else:
-                self.trucks[idx]['static_remaining'] = random.randint(1, self.static_duration_periods)
-        
-        # Calculate random number of trucks to pass before static countdown
-        #min_trucks = max(1, self.max_queue_length // 10)
-        #max_trucks = max(1, self.max_queue_length // 2)
-        self.initial_trucks_to_pass = 4
+        self.details_list = VirtualTruckList(details_frame, height=6)
     
     def apply_settings(self):
         """Apply user settings"""
+        self.stop_simulation()
         try:
-            self.max_queue_length = int(self.max_length_var.get())
-            self.move_interval = int(self.interval_var.get())
-            self.static_trucks_count = int(self.static_count_var.get())
-            self.static_duration_periods = int(self.static_duration_var.get())
+            self.engine.max_queue_length = int(self.max_length_var.get())
+            self.engine.move_interval = int(self.interval_var.get())
+            self.engine.static_trucks_count = int(self.static_count_var.get())
+            self.engine.static_duration_periods = int(self.static_duration_var.get())
             
             self.reset_queue()
             self.status_var.set("Settings applied successfully")
@@ -189,16 +203,21 @@ class BorderQueueSimulator:
     def reset_queue(self):
         """Reset the queue to initial state"""
         self.stop_simulation()
-        self.initialize_queue()
-        self.draw_queue()
-        self.update_stats()
-        self.update_details()
+        self.close_replay()
+        with self.engine_lock:
+            self.engine.initialize_queue()
+            self.snapshots.publish(self.engine.snapshot())
         self.status_var.set("Queue reset")
     
     def start_simulation(self):
         """Start the simulation"""
         if not self.running:
+            if self.replay is not None:
+                # Back to the live engine, from the state it had before the replay
+                self.close_replay()
+                self.snapshots.publish(self.engine.snapshot())
             self.running = True
+            self.stop_event.clear()
             self.simulation_thread = threading.Thread(target=self.run_simulation)
             self.simulation_thread.daemon = True
             self.simulation_thread.start()
@@ -207,153 +226,175 @@ class BorderQueueSimulator:
     def stop_simulation(self):
         """Stop the simulation"""
         self.running = False
+        self.stop_event.set()
         if self.simulation_thread:
             self.simulation_thread.join(timeout=1)
         self.status_var.set("Simulation stopped")
     
     def run_simulation(self):
-        """Main simulation loop"""
-        while self.running:
-            # First update display, then wait, then update queue
-            self.root.after(0, self.draw_queue)
-            self.root.after(0, self.update_stats)
-            self.root.after(0, self.update_details)
-            self.root.after(0, self.calculate_eta)
-            
-            # Wait for the interval
-            time.sleep(self.move_interval)
-            
-            # Then update the queue state
-            self.time_elapsed += self.move_interval
-            self.update_queue()
+        """Main simulation loop (simulation thread): wait, step, publish a snapshot"""
+        while not self.stop_event.wait(self.engine.move_interval):
+            with self.engine_lock:
+                if self.stop_event.is_set():
+                    break
+                self.engine.step()
+                self.snapshots.publish(self.engine.snapshot())
+    
+    def poll_snapshots(self):
+        """Render the newest snapshot or replay frame and Monte Carlo report, then poll again (Tk thread)"""
+        now = time.perf_counter()
+        elapsed = now - self.last_frame_time
+        self.last_frame_time = now
+        
+        if self.playback is not None:
+            if self.playback.playing:
+                self.show_replay_tick(self.playback.advance(elapsed))
+        else:
+            snapshot = self.snapshots.take()
+            if snapshot is not None:
+                self.show_snapshot(snapshot)
+        report = self.mc_reports.take()
+        if report is not None:
+            self.show_monte_carlo_eta(report)
+        self.root.after(FRAME_INTERVAL_MS, self.poll_snapshots)
     
-    def update_queue(self):
-        """Update truck positions and states with improved movement logic"""
-        if not self.trucks:
+    def choose_replay(self):
+        """Ask for a replay file and open it"""
+        path = filedialog.askopenfilename(title="Open Replay",
+                                          filetypes=[("Replay files", "*.bqrp"), ("All files", "*")])
+        if path:
+            self.open_replay(path)
+    
+    def open_replay(self, path):
+        """Show a recorded run instead of the live engine, starting at its first tick"""
+        self.stop_simulation()
+        try:
+            replay = ReplayTrace(path)
+        except (OSError, ValueError) as error:
+            self.status_var.set(f"Error: {error}")
             return
-        
-        # Update wait times for all trucks
-        for truck in self.trucks:
-            truck['wait_time'] += self.move_interval
-        
-        # Sort trucks by position (front to back - position 0 is at border)
-        self.trucks.sort(key=lambda x: x['position'])
-        
-        # Step 1: Check queue length for each static truck and decide if countdown should start
-        # Step 1: Check queue length for each static truck and decide if countdown should start
-        # Step 1: Check empty spots ahead for each static truck
-        for truck in self.trucks:
-            if truck['is_static'] and not truck['countdown_active']:
-                current_pos = truck['position']
-                
-                # Count empty spaces ahead (positions in front of this truck)
-                empty_ahead = 0
-                for pos in range(current_pos - 1, -1, -1):  # from current-1 to 0
-                    occupied = any(t['position'] == pos for t in self.trucks)
-                    if not occupied:
-                        empty_ahead += 1
-                    else:
-                        break  # stop counting once a truck is in front
-                
-                # Random threshold between 2 and 5
-                required_spaces = random.randint(3, 6)
-                
-                if empty_ahead >= required_spaces:
-                    truck['countdown_active'] = True
-
-        
-        # Step 2: Update static truck timers
-        for truck in self.trucks:
-            if truck['is_static'] and truck['countdown_active']:
-                if truck['static_remaining'] > 0:
-                    truck['static_remaining'] -= 1
-                    truck['color'] = 'red'
-                    if truck['static_remaining'] <= 0:
-                        truck['is_static'] = False
-                        truck['color'] = 'orange'
-                        truck['countdown_active'] = False
-        
-        # Step 3: Find the first static truck with an active countdown
-        first_active_static_position = None
-        for truck in self.trucks:
-            if truck['is_static'] and truck['countdown_active']:
-                first_active_static_position = truck['position']
-                break
-        
-        # Step 4: Process movement for all eligible trucks
-        trucks_to_remove = []
-        for i in range(len(self.trucks)):
-            truck = self.trucks[i]
-            
-            # Skip if truck is behind a static truck with active countdown
-            if first_active_static_position is not None and truck['position'] > first_active_static_position:
-                continue
-            
-            # Handle trucks at the border (position 0)
-            if truck['position'] == 0:
-                if not truck['is_static'] or truck['countdown_active']:
-                    trucks_to_remove.append(truck)
-                    self.trucks_crossed += 1
-                continue
-            
-            # Move non-static trucks to the nearest empty position
-            if not truck['is_static']:
-                current_position = truck['position']
-                target_position = 0  # Default to border if no trucks ahead
-                for pos in range(current_position - 1, -1, -1):
-                    position_occupied = any(other_truck['position'] == pos 
-                                          for other_truck in self.trucks if other_truck != truck)
-                    if position_occupied:
-                        target_position = pos + 1
-                        break
-                truck['position'] = target_position
-        
-        # Step 5: Remove trucks that crossed border
-        for truck in trucks_to_remove:
-            self.trucks.remove(truck)
-        
-        # Step 6: Update colors based on status
-        for truck in self.trucks:
-            if truck['is_static'] and truck['static_remaining'] > 0:
-                truck['color'] = 'red'
-            elif not truck['is_static'] and truck['color'] == 'red':
-                truck['color'] = 'orange'
-            elif truck['color'] == 'orange':
-                truck['color'] = 'blue'
-            elif not truck['is_static']:
-                truck['color'] = 'blue'
+        self.close_replay()
+        self.replay = replay
+        self.playback = Playback(replay.first_tick, replay.last_tick)
+        self.set_playback_speed()
+        self.replay_scale.configure(from_=replay.first_tick, to=replay.last_tick)
+        self.status_var.set(f"Replaying {path}")
+        self.show_replay_tick(replay.first_tick)
+    
+    def close_replay(self):
+        """Leave replay mode"""
+        if self.replay is not None:
+            self.replay.close()
+        self.replay = None
+        self.playback = None
+        self.replay_shown_tick = None
+        self.replay_status_var.set("No replay loaded")
+    
+    def show_replay_tick(self, tick):
+        """Render the replay state at the end of a tick"""
+        if tick != self.replay_shown_tick:
+            self.replay_shown_tick = tick
+            self.show_snapshot(self.replay.snapshot_at(tick))
+        self.replay_tick_var.set(tick)
+        self.replay_status_var.set(f"Tick {tick} / {self.replay.last_tick}")
+    
+    def seek_replay(self, tick):
+        """Scrub to a tick (replay slider)"""
+        if self.playback is not None:
+            self.show_replay_tick(self.playback.seek(round(tick)))
+    
+    def step_replay(self, ticks):
+        """Pause and move the replay a number of ticks forward or back"""
+        if self.playback is not None:
+            self.playback.playing = False
+            self.show_replay_tick(self.playback.seek(self.playback.tick + ticks))
+    
+    def toggle_playback(self):
+        """Play or pause the replay; playing from the last tick starts over"""
+        playback = self.playback
+        if playback is None:
+            return
+        if not playback.playing and playback.tick == playback.last_tick and playback.speed > 0:
+            playback.seek(playback.first_tick)
+        playback.playing = not playback.playing
+    
+    def set_playback_speed(self):
+        """Apply the speed entry to the replay; negative speeds play backwards"""
+        try:
+            speed = float(self.speed_var.get())
+        except ValueError:
+            self.status_var.set("Error: Please enter a valid playback speed")
+            return
+        if self.playback is not None:
+            self.playback.speed = speed
+    
+    def show_snapshot(self, snapshot):
+        """Make a snapshot the displayed state and refresh every view"""
+        self.snapshot = snapshot
+        self.draw_queue()
+        self.update_stats()
+        self.update_details()
+        self.calculate_eta()
     
     def calculate_eta(self):
-        """Calculate ETA for the last truck"""
-        if not self.trucks:
+        """Display the engine's ETA for the last truck"""
+        snapshot = self.snapshot
+        if snapshot.eta is None:
             self.eta_var.set("Last Truck ETA: All trucks crossed!")
             return
         
-        # Find the truck at the back of the queue
-        last_truck = max(self.trucks, key=lambda x: x['position'])
-        
-        # Calculate estimated time based on current queue dynamics
-        total_trucks_ahead = last_truck['position']
-        
-        # Base time: number of trucks ahead × move interval
-        base_time = total_trucks_ahead * self.move_interval
+        self.eta_var.set(f"Last Truck ETA: ~{snapshot.eta} seconds")
+        self.time_var.set(f"Time Elapsed: {snapshot.time_elapsed} seconds | Trucks Crossed: {snapshot.trucks_crossed}")
+    
+    def start_monte_carlo_eta(self):
+        """Run a Monte Carlo ETA estimate for the current queue state in the background"""
+        if self.replay is not None:
+            engine = self.replay.seek(self.playback.tick).fork()
+        else:
+            with self.engine_lock:
+                engine = self.engine.fork()
+        self.mc_eta_var.set("Monte Carlo ETA: running...")
+        
+        def worker():
+            self.mc_reports.publish(monte_carlo_eta(engine, replicas=1000)['last_truck'])
+        
+        threading.Thread(target=worker, daemon=True).start()
+    
+    def show_monte_carlo_eta(self, report):
+        """Display the Monte Carlo ETA percentiles for the last truck"""
+        self.mc_eta_var.set(f"Monte Carlo ETA: mean {report['mean']:.0f}s | p50 {report['p50']:.0f}s | "
+                            f"p90 {report['p90']:.0f}s | p99 {report['p99']:.0f}s | "
+                            f"stalled runs: {report['stalled']}/{report['replicas']}")
+    
+    def scroll_canvas(self, *args):
+        """Scroll the queue canvas horizontally and draw the newly visible slots"""
+        self.canvas.xview(*args)
+        self.draw_queue()
+    
+    def reset_canvas(self, canvas_width, canvas_height, bar_width, start_y):
+        """Clear the canvas and draw the items that only change with the layout"""
+        self.canvas.delete("all")
+        self.slot_items = {}
+        self.truck_items = {}
         
-        # Add delay only for static trucks with active countdown
-        static_delay = 0
-        if self.trucks_crossed >= self.initial_trucks_to_pass:
-            static_delay = sum(truck['static_remaining'] * self.move_interval 
-                              for truck in self.trucks 
-                              if truck['is_static'] and truck['countdown_active'])
+        total_width = 40 + self.snapshot.max_queue_length * bar_width
+        self.canvas.configure(scrollregion=(0, 0, total_width, canvas_height))
         
-        estimated_eta = base_time + static_delay
+        # Draw border line
+        border_x = 15
+        bar_height = 40
+        self.canvas.create_line(border_x, start_y - 20, border_x, start_y + bar_height + 20,
+                              fill="green", width=4)
+        self.canvas.create_text(border_x, start_y - 30, text="BORDER", fill="green", font=("Arial", 12, "bold"))
         
-        self.eta_var.set(f"Last Truck ETA: ~{estimated_eta} seconds")
-        self.time_var.set(f"Time Elapsed: {self.time_elapsed} seconds | Trucks Crossed: {self.trucks_crossed}")
+        # Draw direction arrow (right to left movement)
+        arrow_y = start_y - 50
+        self.canvas.create_line(canvas_width - 50, arrow_y, 50, arrow_y, fill="blue", width=2, arrow=tk.LAST)
+        self.canvas.create_text(canvas_width//2, arrow_y - 15, text="Direction of Movement (Right → Left)", fill="blue", font=("Arial", 10))
     
     def draw_queue(self):
-        """Draw the current queue state"""
-        self.canvas.delete("all")
-        
+        """Update the canvas items for the visible part of the displayed snapshot in place"""
+        snapshot = self.snapshot
         canvas_width = self.canvas.winfo_width()
         canvas_height = self.canvas.winfo_height()
         
@@ -361,109 +402,199 @@ class BorderQueueSimulator:
             return
         
         # Calculate bar dimensions
-        bar_width = max(20, (canvas_width - 40) // self.max_queue_length)
+        bar_width = max(20, (canvas_width - 40) // snapshot.max_queue_length)
         bar_height = 40
         start_y = (canvas_height - bar_height) // 2
         
-        # Draw background queue slots
-        for i in range(self.max_queue_length):
-            x = 20 + i * bar_width
-            self.canvas.create_rectangle(x, start_y, x + bar_width - 2, start_y + bar_height,
-                                       fill="lightgray", outline="black", width=1)
-            self.canvas.create_text(x + bar_width//2, start_y + bar_height + 15,
-                                  text=str(i), font=("Arial", 8))
-        
-        # Draw trucks in their current positions
-        for truck in self.trucks:
-            pos = truck['position']
-            if 0 <= pos < self.max_queue_length:
-                x = 20 + pos * bar_width
-                self.canvas.create_rectangle(x, start_y, x + bar_width - 2, start_y + bar_height,
-                                           fill=truck['color'], outline="black", width=2)
-                
-                # Add truck ID
-                self.canvas.create_text(x + bar_width//2, start_y + bar_height//2,
-                                      text=str(truck['id']), fill="white", font=("Arial", 10, "bold"))
-                
-                # Add static remaining time if applicable
-                if truck['is_static'] and truck['static_remaining'] > 0:
-                    # Show remaining periods above the truck
-                    remaining_text = f"{truck['static_remaining']} periods left"
+        layout = (canvas_width, canvas_height, snapshot.max_queue_length)
+        if layout != self.canvas_layout:
+            self.canvas_layout = layout
+            self.reset_canvas(canvas_width, canvas_height, bar_width, start_y)
+        
+        # Only slots inside the scrolled viewport get canvas items
+        view_left = self.canvas.canvasx(0)
+        first_slot = max(0, int((view_left - 20) // bar_width))
+        last_slot = min(snapshot.max_queue_length - 1,
+                        int((view_left + canvas_width - 20) // bar_width))
+        visible_slots = range(first_slot, last_slot + 1)
+        
+        # Background queue slots: drop the ones scrolled out, add the ones scrolled in
+        for i in [i for i in self.slot_items if not first_slot <= i <= last_slot]:
+            for item in self.slot_items.pop(i):
+                self.canvas.delete(item)
+        new_slots = False
+        for i in visible_slots:
+            if i not in self.slot_items:
+                x = 20 + i * bar_width
+                self.slot_items[i] = (
+                    self.canvas.create_rectangle(x, start_y, x + bar_width - 2, start_y + bar_height,
+                                                 fill="lightgray", outline="black", width=1, tags="slot"),
+                    self.canvas.create_text(x + bar_width//2, start_y + bar_height + 15,
+                                            text=str(i), font=("Arial", 8), tags="slot"))
+                new_slots = True
+        if new_slots:
+            self.canvas.tag_lower("slot")
+        
+        # Trucks in the visible slots, keyed by truck id
+        visible_trucks = {truck.id: truck for truck in snapshot.trucks_between(first_slot, last_slot)}
+        
+        for truck_id in [t for t in self.truck_items if t not in visible_trucks]:
+            for item in self.truck_items.pop(truck_id)['items']:
+                self.canvas.delete(item)
+        
+        for truck_id, truck in visible_trucks.items():
+            remaining = truck.static_remaining if truck.is_static else 0
+            color = STATE_COLORS[truck.state]
+            state = (truck.position, color, remaining)
+            entry = self.truck_items.get(truck_id)
+            if entry is not None and entry['state'] == state:
+                continue
+            
+            x = 20 + truck.position * bar_width
+            if entry is None:
+                items = (
+                    self.canvas.create_rectangle(x, start_y, x + bar_width - 2, start_y + bar_height,
+                                                 fill=color, outline="black", width=2),
+                    # Truck ID
+                    self.canvas.create_text(x + bar_width//2, start_y + bar_height//2,
+                                            text=str(truck_id), fill="white", font=("Arial", 10, "bold")),
+                    # Remaining periods above the truck
                     self.canvas.create_text(x + bar_width//2, start_y - 15,
-                                          text=remaining_text, fill="red", font=("Arial", 8, "bold"))
-                    
-                    # Also show a small indicator
+                                            text="", fill="red", font=("Arial", 8, "bold")),
+                    # Small static indicator
                     self.canvas.create_oval(x + bar_width - 8, start_y + 2, x + bar_width - 2, start_y + 8,
-                                          fill="yellow", outline="red", width=2)
-        
-        # Draw border line
-        border_x = 15
-        self.canvas.create_line(border_x, start_y - 20, border_x, start_y + bar_height + 20,
-                              fill="green", width=4)
-        self.canvas.create_text(border_x, start_y - 30, text="BORDER", fill="green", font=("Arial", 12, "bold"))
-        
-        # Draw direction arrow (right to left movement)
-        arrow_y = start_y - 50
-        self.canvas.create_line(canvas_width - 50, arrow_y, 50, arrow_y, fill="blue", width=2, arrow=tk.LAST)
-        self.canvas.create_text(canvas_width//2, arrow_y - 15, text="Direction of Movement (Right → Left)", fill="blue", font=("Arial", 10))
+                                            fill="yellow", outline="red", width=2))
+                entry = self.truck_items[truck_id] = {'items': items, 'state': None}
+            
+            rect, id_text, remaining_text, indicator = entry['items']
+            old_state = entry['state']
+            if old_state is None or old_state[0] != state[0]:
+                self.canvas.coords(rect, x, start_y, x + bar_width - 2, start_y + bar_height)
+                self.canvas.coords(id_text, x + bar_width//2, start_y + bar_height//2)
+                self.canvas.coords(remaining_text, x + bar_width//2, start_y - 15)
+                self.canvas.coords(indicator, x + bar_width - 8, start_y + 2, x + bar_width - 2, start_y + 8)
+            if old_state is None or old_state[1] != state[1]:
+                self.canvas.itemconfigure(rect, fill=color)
+            if old_state is None or old_state[2] != state[2]:
+                # Static remaining time only shows while the truck is stuck
+                shown = tk.NORMAL if remaining > 0 else tk.HIDDEN
+                self.canvas.itemconfigure(remaining_text, text=f"{remaining} periods left", state=shown)
+                self.canvas.itemconfigure(indicator, state=shown)
+            entry['state'] = state
     
     def update_stats(self):
         """Update statistics display"""
-        if not self.trucks:
+        trucks = self.snapshot.trucks
+        if not trucks:
             self.stats_var.set("All trucks have crossed the border!")
             return
         
-        total_trucks = len(self.trucks)
-        static_trucks = sum(1 for truck in self.trucks if truck['is_static'])
+        total_trucks = len(trucks)
+        static_trucks = sum(1 for truck in trucks if truck.is_static)
         moving_trucks = total_trucks - static_trucks
         
         # Calculate average wait time
-        avg_wait_time = sum(truck['wait_time'] for truck in self.trucks) / total_trucks if total_trucks > 0 else 0
+        avg_wait_time = sum(truck.wait_time for truck in trucks) / total_trucks if total_trucks > 0 else 0
         
         stats_text = (f"Trucks in Queue: {total_trucks} | Moving: {moving_trucks} | "
                      f"Static: {static_trucks} | Avg Wait Time: {avg_wait_time:.1f}s | "
-                     f"Trucks Crossed: {self.trucks_crossed}")
+                     f"Trucks Crossed: {self.snapshot.trucks_crossed}")
         self.stats_var.set(stats_text)
     
     def update_details(self):
-        """Update detailed truck information"""
-        self.details_text.delete(1.0, tk.END)
+        """Update detailed truck information for the rows in view"""
+        trucks = self.snapshot.trucks
         
-        if not self.trucks:
-            self.details_text.insert(tk.END, "No trucks remaining in queue.\n")
+        if not trucks:
+            self.details_list.set_rows("No trucks remaining in queue.", 0, None)
             return
         
-        # Sort trucks by position for display
-        sorted_trucks = sorted(self.trucks, key=lambda x: x['position'])
+        eta_index = self.snapshot.eta_index
         
-        details = "Truck Details (Position | ID | Status | Wait Time | Static Remaining):\n"
-        for truck in sorted_trucks:
-            if truck['is_static']:
-                status = f"STATIC({truck['static_remaining']}p)"
-                static_info = f"{truck['static_remaining']}p"
+        def row_text(index):
+            truck = trucks[index]
+            if truck.is_static:
+                status = f"STATIC({truck.static_remaining}p)"
+                static_info = f"{truck.static_remaining}p"
             else:
                 status = "MOVING"
                 static_info = "N/A"
-            details += (f"Pos {truck['position']:2d} | ID {truck['id']:2d} | {status:10s} | "
-                       f"{truck['wait_time']:3d}s | {static_info}\n")
+            return (f"Pos {truck.position:2d} | ID {truck.id:2d} | {status:10s} | "
+                    f"{truck.wait_time:3d}s | {static_info:4s} | ETA {eta_index.eta_at(truck.position)}s")
         
-        self.details_text.insert(tk.END, details)
+        # Snapshot trucks are already sorted by position
+        self.details_list.set_rows("Truck Details (Position | ID | Status | Wait Time | Static Remaining | ETA):",
+                                   len(trucks), row_text)
 
-def main():
-    root = tk.Tk()
-    app = BorderQueueSimulator(root)
+class VirtualTruckList:
+    """Read-only text list that only renders the rows scrolled into view"""
     
-    # Bind window close event
-    def on_closing():
-        app.stop_simulation()
-        root.destroy()
+    def __init__(self, parent, height=6):
+        self.height = height
+        self.header = ""
+        self.row_count = 0
+        self.row_text = None
+        self.first_row = 0
+        self.rendered = None
+        
+        self.text = tk.Text(parent, height=height, wrap=tk.NONE)
+        self.scrollbar = ttk.Scrollbar(parent, orient="vertical", command=self.yview)
+        self.text.pack(side=tk.LEFT, fill=tk.BOTH, expand=True)
+        self.scrollbar.pack(side=tk.RIGHT, fill=tk.Y)
+        
+        self.text.bind("<MouseWheel>", lambda event: self.scroll(-1 if event.delta > 0 else 1))
+        self.text.bind("<Button-4>", lambda event: self.scroll(-1))
+        self.text.bind("<Button-5>", lambda event: self.scroll(1))
     
-    root.protocol("WM_DELETE_WINDOW", on_closing)
-    root.mainloop()
+    def visible_rows(self):
+        """Number of data rows that fit below the header line"""
+        return max(1, self.height - 1)
+    
+    def set_rows(self, header, row_count, row_text):
+        """Replace the list contents; row_text(index) formats one row on demand"""
+        self.header = header
+        self.row_count = row_count
+        self.row_text = row_text
+        self.render()
+    
+    def scroll(self, rows):
+        """Scroll by a number of rows"""
+        self.first_row += rows
+        self.render()
+        return "break"
+    
+    def yview(self, *args):
+        """Scrollbar command: handles 'moveto fraction' and 'scroll n units|pages'"""
+        if args[0] == tk.MOVETO:
+            self.first_row = int(float(args[1]) * self.row_count)
+        elif args[0] == tk.SCROLL:
+            step = self.visible_rows() if args[2] == tk.PAGES else 1
+            self.first_row += int(args[1]) * step
+        self.render()
+    
+    def render(self):
+        """Redraw the text only if the visible rows changed"""
+        visible = self.visible_rows()
+        self.first_row = max(0, min(self.first_row, self.row_count - visible))
+        last_row = min(self.row_count, self.first_row + visible)
+        
+        lines = [self.header] + [self.row_text(i) for i in range(self.first_row, last_row)]
+        content = "\n".join(lines)
+        if content != self.rendered:
+            self.rendered = content
+            self.text.delete(1.0, tk.END)
+            self.text.insert(tk.END, content)
+        
+        if self.row_count:
+            self.scrollbar.set(self.first_row / self.row_count, last_row / self.row_count)
+        else:
+            self.scrollbar.set(0, 1)
 
-def main():
+def main(replay_path=None):
     root = tk.Tk()
     app = BorderQueueSimulator(root)
+    if replay_path:
+        app.open_replay(replay_path)
     
     # Bind window close event
     def on_closing():
@@ -474,5 +605,6 @@ def main():
     root.mainloop()
 
 if __name__ == "__main__":
-    main()
+    # Optional argument: a replay file recorded with `simulate.py --replay`
+    main(*sys.argv[1:2])
 
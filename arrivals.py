@@ -0,0 +1,226 @@
+"""Continuous truck arrivals feeding a bounded queue, with crossed trucks streamed out
+
+An arrival process produces arrival times in seconds from the start of the run.
+StreamingQueue joins arriving trucks at the back of a queue engine, holds them in
+a bounded backlog while the queue is full, and hands a record per crossed truck to
+a generator or sink instead of keeping it, so memory stays flat however many
+trucks pass through.
+"""
+import csv
+import math
+import random
+from collections import deque
+from datetime import datetime
+
+RECORD_FIELDS = ['id', 'arrival_time', 'join_time', 'cross_time', 'time_in_system',
+                 'join_position']
+# Trucks waiting for room in a full queue before later arrivals are dropped
+DEFAULT_MAX_BACKLOG = 10000
+
+
+class PoissonArrivals:
+    """Arrivals at a constant average rate with exponential gaps between trucks"""
+
+    def __init__(self, rate_per_hour, seed=None):
+        self.rate_per_second = rate_per_hour / 3600
+        self.rng = random.Random(seed)
+        self.next_time = self._gap()
+
+    def _gap(self):
+        return self.rng.expovariate(self.rate_per_second) if self.rate_per_second > 0 else math.inf
+
+    def arrivals_until(self, time):
+        """Return the arrival times up to and including `time` not returned before"""
+        times = []
+        while self.next_time <= time:
+            times.append(self.next_time)
+            self.next_time += self._gap()
+        return times
+
+
+class RateTableArrivals:
+    """Poisson arrivals whose rate follows a repeating table, e.g. 24 hourly rates
+
+    `rates` are trucks per hour for equal slices of `period` seconds; `start` is the
+    time of day (seconds) at which the run begins. Arrivals are drawn at the peak rate
+    and thinned to the rate of the slice they fall in.
+    """
+
+    def __init__(self, rates, period=86400, start=0, seed=None):
+        self.rates = list(rates)
+        self.period = period
+        self.start = start
+        self.peak = PoissonArrivals(max(self.rates), seed)
+        self.rng = self.peak.rng
+
+    def rate_at(self, time):
+        """Trucks per hour at a run time"""
+        slice_length = self.period / len(self.rates)
+        return self.rates[int(((self.start + time) % self.period) // slice_length)]
+
+    def arrivals_until(self, time):
+        """Return the arrival times up to and including `time` not returned before"""
+        peak_rate = self.peak.rate_per_second * 3600
+        return [t for t in self.peak.arrivals_until(time)
+                if self.rng.random() * peak_rate < self.rate_at(t)]
+
+
+class ReplayArrivals:
+    """Arrivals replayed from a file with one timestamp per line, read lazily
+
+    Lines hold either seconds from the start of the run or ISO 8601 timestamps,
+    which are taken relative to the first one. Blank lines and lines starting
+    with '#' are skipped.
+    """
+
+    def __init__(self, path):
+        self.file = open(path)
+        self.origin = None
+        self.next_time = self._read()
+
+    def _read(self):
+        for line in self.file:
+            line = line.strip()
+            if not line or line.startswith('#'):
+                continue
+            try:
+                return float(line)
+            except ValueError:
+                timestamp = datetime.fromisoformat(line).timestamp()
+                if self.origin is None:
+                    self.origin = timestamp
+                return timestamp - self.origin
+        self.file.close()
+        return math.inf
+
+    def __iter__(self):
+        """Yield every timestamp not returned before, in file order"""
+        while self.next_time != math.inf:
+            time, self.next_time = self.next_time, self._read()
+            yield time
+
+    def arrivals_until(self, time):
+        """Return the arrival times up to and including `time` not returned before"""
+        times = []
+        while self.next_time <= time:
+            times.append(self.next_time)
+            self.next_time = self._read()
+        return times
+
+
+class StreamingQueue:
+    """Run a queue engine with continuous arrivals, streaming out crossed trucks
+
+    Arrivals join the back of the queue at the start of the tick after they arrive,
+    static with `static_probability` (default: the engine's initial static share).
+    Arrivals that would join within the engine's min_unstick_spaces of the border
+    join moving, since a static truck there could never start its countdown. While the queue is
+    full, arrivals wait in a backlog of at most `max_backlog` trucks; beyond that
+    they are turned away and counted in `dropped`. max_backlog=None removes the
+    bound, and the backlog then grows for as long as arrivals outpace crossings.
+    """
+
+    def __init__(self, engine, arrivals, static_probability=None, max_backlog=DEFAULT_MAX_BACKLOG, seed=None):
+        self.engine = engine
+        self.arrivals = arrivals
+        if static_probability is None:
+            static_probability = (engine.static_trucks_count / engine.max_queue_length
+                                  if engine.max_queue_length else 0)
+        self.static_probability = static_probability
+        self.max_backlog = max_backlog
+        self.rng = random.Random(seed)
+
+        self.backlog = deque()
+        # Arrival and join time of every truck in the queue, dropped once it crosses
+        self.in_queue = {truck.id: (0, 0, truck.position) for truck in engine.trucks}
+        self.arrived = 0
+        self.dropped = 0
+        self.crossed = 0
+        self.total_time_in_system = 0
+        self.max_backlog_seen = 0
+
+    def step(self):
+        """Admit waiting arrivals, advance the engine one tick and return crossing records"""
+        engine = self.engine
+        for arrival_time in self.arrivals.arrivals_until(engine.time_elapsed):
+            self.arrived += 1
+            if self.max_backlog is not None and len(self.backlog) >= self.max_backlog:
+                self.dropped += 1
+            else:
+                self.backlog.append(arrival_time)
+        self.max_backlog_seen = max(self.max_backlog_seen, len(self.backlog))
+
+        # Join the back of the queue while there is room
+        while self.backlog and engine.free_slots():
+            position = engine.tail_position()
+            static_remaining = 0
+            if position >= engine.min_unstick_spaces and self.rng.random() < self.static_probability:
+                static_remaining = engine.draw_static_duration(position)
+            truck = engine.add_truck(static_remaining=static_remaining)
+            self.in_queue[truck.id] = (self.backlog.popleft(), engine.time_elapsed, position)
+
+        result = engine.step()
+        records = []
+        for truck_id in result['crossed_ids']:
+            arrival_time, join_time, join_position = self.in_queue.pop(truck_id)
+            time_in_system = result['time_elapsed'] - arrival_time
+            self.crossed += 1
+            self.total_time_in_system += time_in_system
+            records.append({
+                'id': truck_id,
+                'arrival_time': arrival_time,
+                'join_time': join_time,
+                'cross_time': result['time_elapsed'],
+                'time_in_system': time_in_system,
+                'join_position': join_position,
+            })
+        return records
+
+    def records(self, ticks=None):
+        """Yield a record per crossed truck, for a number of ticks or indefinitely"""
+        tick = 0
+        while ticks is None or tick < ticks:
+            yield from self.step()
+            tick += 1
+
+    def run(self, ticks, sink=None):
+        """Advance a number of ticks, passing each crossing record to `sink` if given"""
+        for record in self.records(ticks):
+            if sink is not None:
+                sink(record)
+        return self.summary()
+
+    def summary(self):
+        """Running totals of the run so far"""
+        return {
+            'time_elapsed': self.engine.time_elapsed,
+            'arrived': self.arrived,
+            'crossed': self.crossed,
+            'dropped': self.dropped,
+            'in_queue': self.engine.queue_length(),
+            'backlog': len(self.backlog),
+            'max_backlog': self.max_backlog_seen,
+            'mean_time_in_system': (self.total_time_in_system / self.crossed
+                                    if self.crossed else math.nan),
+        }
+
+
+class CsvSink:
+    """Sink that appends crossing records to a CSV file as they arrive"""
+
+    def __init__(self, path):
+        self.file = open(path, 'w', newline='')
+        self.writer = csv.DictWriter(self.file, fieldnames=RECORD_FIELDS)
+        self.writer.writeheader()
+
+    def __call__(self, record):
+        self.writer.writerow(record)
+
+    def close(self):
+        self.file.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
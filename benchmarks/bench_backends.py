@@ -0,0 +1,46 @@
+"""Compare ticks per second of the dict-based and NumPy queue engine backends
+
+Usage: python benchmarks/bench_backends.py [queue lengths...]
+"""
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from queue_engine import create_engine
+
+DEFAULT_LENGTHS = [50, 500, 5000, 50000, 100000]
+STATIC_DENSITY = 0.1
+SEED = 1234
+MIN_SECONDS = 0.5
+MAX_TICKS = 200
+
+
+def ticks_per_second(backend, queue_length):
+    """Time ticks of a fresh seeded queue until MIN_SECONDS or MAX_TICKS is reached"""
+    engine = create_engine(backend, max_queue_length=queue_length,
+                           static_trucks_count=int(queue_length * STATIC_DENSITY),
+                           static_duration_periods=8, seed=SEED)
+    ticks = 0
+    start = time.perf_counter()
+    elapsed = 0.0
+    while ticks < MAX_TICKS and elapsed < MIN_SECONDS and engine.queue_length():
+        engine.step()
+        ticks += 1
+        elapsed = time.perf_counter() - start
+    return ticks / elapsed if elapsed else float('inf')
+
+
+def main(argv):
+    lengths = [int(arg) for arg in argv] or DEFAULT_LENGTHS
+    print(f"{'queue length':>12} | {'python ticks/s':>14} | {'numpy ticks/s':>13} | {'speedup':>7}")
+    for queue_length in lengths:
+        python_rate = ticks_per_second('python', queue_length)
+        numpy_rate = ticks_per_second('numpy', queue_length)
+        print(f"{queue_length:>12} | {python_rate:>14.1f} | {numpy_rate:>13.1f} | "
+              f"{numpy_rate / python_rate:>6.1f}x")
+
+
+if __name__ == "__main__":
+    main(sys.argv[1:])
@@ -0,0 +1,287 @@
+"""Reproducible benchmark suite for the engine tick, ETA computation and viewer rendering
+
+Usage:
+    python benchmarks/bench_suite.py --output bench.json
+    python benchmarks/bench_suite.py --lengths 50 5000 --densities 0 0.5 --backends python
+    python benchmarks/bench_suite.py --output new.json --compare old.json
+
+For every backend, queue length and static-truck density this measures, on a queue
+built from a fixed seed:
+- ticks per second of engine.step()
+- calculate_eta() and all_etas() time on the first call after a tick
+- engine.snapshot() plus draw_queue(), update_stats() and update_details() time per frame
+
+Rendering runs against a real Tk canvas when a display is available and otherwise
+against headless stand-in widgets that accept the same calls, so only the Python side
+of the viewer is timed. Results go to a JSON file; --compare prints the ratio of each
+metric to an earlier results file so regressions stand out between commits.
+"""
+import argparse
+import json
+import os
+import platform
+import subprocess
+import sys
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from queue_engine import BACKENDS, create_engine
+
+DEFAULT_LENGTHS = [50, 500, 5000, 50000, 1000000]
+DEFAULT_DENSITIES = [0.0, 0.1, 0.25, 0.5]
+SEED = 1234
+STATIC_DURATION_PERIODS = 8
+MIN_SECONDS = 0.5
+MAX_TICKS = 200
+SAMPLES = 20
+# Sampling stops early after MIN_SECONDS once this many samples were taken
+MIN_SAMPLES = 3
+
+# Metrics where larger is better; every other metric is a time
+RATE_METRICS = ('ticks_per_second',)
+
+
+class HeadlessCanvas:
+    """Stand-in for tk.Canvas that accepts the viewer's calls without drawing"""
+
+    def __init__(self, width=1200, height=300):
+        self.width = width
+        self.height = height
+        self.next_item = 0
+
+    def _create(self, *args, **kwargs):
+        self.next_item += 1
+        return self.next_item
+
+    create_line = create_text = create_rectangle = create_oval = _create
+
+    def winfo_width(self):
+        return self.width
+
+    def winfo_height(self):
+        return self.height
+
+    def canvasx(self, x):
+        return x
+
+    def delete(self, *args, **kwargs):
+        pass
+
+    coords = itemconfigure = configure = tag_lower = delete
+
+
+class HeadlessText:
+    """Stand-in for tk.Text and ttk.Scrollbar"""
+
+    def delete(self, *args, **kwargs):
+        pass
+
+    insert = set = delete
+
+
+class HeadlessVar:
+    """Stand-in for tk.StringVar"""
+
+    def set(self, value):
+        self.value = value
+
+
+def make_viewer(engine):
+    """Build a BorderQueueSimulator around an engine, on Tk if a display is available"""
+    import Queue_ETA
+
+    try:
+        root = Queue_ETA.tk.Tk()
+    except Queue_ETA.tk.TclError:
+        root = None
+
+    if root is not None:
+        app = Queue_ETA.BorderQueueSimulator(root)
+        root.update()
+        app.engine = engine
+        app.snapshot = engine.snapshot()
+        return app, 'tk'
+
+    app = Queue_ETA.BorderQueueSimulator.__new__(Queue_ETA.BorderQueueSimulator)
+    app.engine = engine
+    app.snapshot = engine.snapshot()
+    app.canvas = HeadlessCanvas()
+    app.canvas_layout = None
+    app.slot_items = {}
+    app.truck_items = {}
+    app.stats_var = HeadlessVar()
+    details = Queue_ETA.VirtualTruckList.__new__(Queue_ETA.VirtualTruckList)
+    details.height = 6
+    details.header = ""
+    details.row_count = 0
+    details.row_text = None
+    details.first_row = 0
+    details.rendered = None
+    details.text = HeadlessText()
+    details.scrollbar = HeadlessText()
+    app.details_list = details
+    return app, 'headless'
+
+
+def make_engine(backend, queue_length, density):
+    return create_engine(backend, max_queue_length=queue_length,
+                         static_trucks_count=int(queue_length * density),
+                         static_duration_periods=STATIC_DURATION_PERIODS, seed=SEED)
+
+
+def time_ticks(engine):
+    """Ticks per second until MIN_SECONDS or MAX_TICKS is reached"""
+    ticks = 0
+    start = time.perf_counter()
+    elapsed = 0.0
+    while ticks < MAX_TICKS and elapsed < MIN_SECONDS and engine.queue_length():
+        engine.step()
+        ticks += 1
+        elapsed = time.perf_counter() - start
+    return ticks / elapsed if elapsed else None
+
+
+def time_etas(engine):
+    """Mean seconds of calculate_eta() and all_etas(), each on the first call after a tick"""
+    samples = {calculate: [] for calculate in (engine.calculate_eta, engine.all_etas)}
+    started = time.perf_counter()
+    for sample in range(SAMPLES):
+        if sample >= MIN_SAMPLES and time.perf_counter() - started > MIN_SECONDS:
+            break
+        for calculate, times in samples.items():
+            if not engine.queue_length():
+                break
+            engine.step()
+            start = time.perf_counter()
+            calculate()
+            times.append(time.perf_counter() - start)
+    return [mean(times) for times in samples.values()]
+
+
+def time_render(engine):
+    """Mean seconds per frame of snapshot(), draw_queue(), update_stats(), update_details()"""
+    app, mode = make_viewer(engine)
+    app.draw_queue()  # the first frame lays out the canvas
+    phases = {'snapshot': [], 'draw_queue': [], 'update_stats': [], 'update_details': []}
+    started = time.perf_counter()
+    for sample in range(SAMPLES):
+        if not engine.queue_length():
+            break
+        if sample >= MIN_SAMPLES and time.perf_counter() - started > MIN_SECONDS:
+            break
+        engine.step()
+        start = time.perf_counter()
+        app.snapshot = engine.snapshot()
+        phases['snapshot'].append(time.perf_counter() - start)
+        for name in ('draw_queue', 'update_stats', 'update_details'):
+            start = time.perf_counter()
+            getattr(app, name)()
+            phases[name].append(time.perf_counter() - start)
+    if mode == 'tk':
+        app.root.destroy()
+    return {name: mean(samples) for name, samples in phases.items()}, mode
+
+
+def mean(samples):
+    return sum(samples) / len(samples) if samples else None
+
+
+def run_case(backend, queue_length, density, render=True):
+    """Measure one backend / queue length / density combination"""
+    start = time.perf_counter()
+    engine = make_engine(backend, queue_length, density)
+    result = {
+        'backend': backend,
+        'queue_length': queue_length,
+        'static_density': density,
+        'setup_seconds': time.perf_counter() - start,
+        'ticks_per_second': time_ticks(engine),
+    }
+    eta_last, eta_all = time_etas(make_engine(backend, queue_length, density))
+    result['calculate_eta_seconds'] = eta_last
+    result['all_etas_seconds'] = eta_all
+    if render:
+        phases, mode = time_render(make_engine(backend, queue_length, density))
+        result['render_mode'] = mode
+        for name, seconds in phases.items():
+            result[f'{name}_seconds'] = seconds
+    return result
+
+
+def environment():
+    """Where and on what code the results were measured"""
+    try:
+        commit = subprocess.run(['git', 'rev-parse', 'HEAD'], cwd=ROOT, capture_output=True,
+                                text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        commit = None
+    try:
+        import numpy
+        numpy_version = numpy.__version__
+    except ImportError:
+        numpy_version = None
+    return {
+        'commit': commit,
+        'python': platform.python_version(),
+        'numpy': numpy_version,
+        'platform': platform.platform(),
+        'processor': platform.processor(),
+        'cpu_count': os.cpu_count(),
+        'time': time.strftime('%Y-%m-%dT%H:%M:%S'),
+        'seed': SEED,
+    }
+
+
+def case_key(result):
+    return (result['backend'], result['queue_length'], result['static_density'])
+
+
+def compare(results, baseline_path):
+    """Print new/old ratios per metric; above 1 is faster for rates, slower for times"""
+    with open(baseline_path) as f:
+        baseline = {case_key(result): result for result in json.load(f)['results']}
+    for result in results:
+        old = baseline.get(case_key(result))
+        if old is None:
+            continue
+        ratios = []
+        for name, value in result.items():
+            if not (name in RATE_METRICS or name.endswith('_seconds')) or name == 'setup_seconds':
+                continue
+            if value and old.get(name):
+                ratio = value / old[name] if name in RATE_METRICS else old[name] / value
+                ratios.append(f"{name.replace('_seconds', '')} {ratio:.2f}x")
+        print(f"{result['backend']:>6} n={result['queue_length']:<8} "
+              f"density={result['static_density']:<5} speedup: " + ", ".join(ratios))
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark the queue engines and the viewer")
+    parser.add_argument('--lengths', nargs='+', type=int, default=DEFAULT_LENGTHS)
+    parser.add_argument('--densities', nargs='+', type=float, default=DEFAULT_DENSITIES)
+    parser.add_argument('--backends', nargs='+', default=list(BACKENDS), choices=list(BACKENDS))
+    parser.add_argument('--no-render', action='store_true', help="Skip the viewer timings")
+    parser.add_argument('--output', default='bench.json')
+    parser.add_argument('--compare', metavar='BASELINE', help="Earlier results file to compare with")
+    args = parser.parse_args(argv)
+
+    results = []
+    for queue_length in args.lengths:
+        for density in args.densities:
+            for backend in args.backends:
+                result = run_case(backend, queue_length, density, render=not args.no_render)
+                results.append(result)
+                print(f"{backend:>6} n={queue_length:<8} density={density:<5} "
+                      f"{result['ticks_per_second'] or 0:>10.1f} ticks/s", flush=True)
+
+    with open(args.output, 'w') as f:
+        json.dump({'environment': environment(), 'results': results}, f, indent=2)
+    print(f"Wrote {len(results)} results to {args.output}")
+    if args.compare:
+        compare(results, args.compare)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,107 @@
+"""Compare memory and access speed of the per-truck dict layout with the Truck record
+
+Usage: python benchmarks/bench_truck_layout.py [truck counts...]
+
+For each truck count this builds the trucks as eight-key dicts (the old layout,
+with the colour stored as a string), as Truck __slots__ records and as the NumPy
+struct-of-arrays used by NumpyQueueEngine, and reports bytes per truck plus the time
+of one update_queue-style pass (advance wait times, check the state of every truck).
+"""
+import os
+import sys
+import time
+import tracemalloc
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import numpy as np
+
+from truck import MOVING, STATIC, Truck
+
+DEFAULT_COUNTS = [1000, 100000, 1000000]
+STATIC_EVERY = 10
+PASSES = 5
+
+
+def build_dicts(count):
+    return [{
+        'id': i + 1,
+        'position': i,
+        'is_static': i % STATIC_EVERY == 0,
+        'static_remaining': 4 if i % STATIC_EVERY == 0 else 0,
+        'original_position': i,
+        'wait_time': 0,
+        'color': 'red' if i % STATIC_EVERY == 0 else 'blue',
+        'countdown_active': False
+    } for i in range(count)]
+
+
+def build_records(count):
+    return [Truck(i + 1, i, 4 if i % STATIC_EVERY == 0 else 0) for i in range(count)]
+
+
+def build_arrays(count):
+    indices = np.arange(count, dtype=np.int64)
+    static = indices % STATIC_EVERY == 0
+    return {
+        'ids': indices + 1,
+        'positions': indices.copy(),
+        'original_positions': indices.copy(),
+        'states': np.where(static, STATIC, MOVING).astype(np.int8),
+        'static_remaining': np.where(static, 4, 0),
+        'wait_times': np.zeros(count, dtype=np.int64),
+    }
+
+
+def pass_dicts(trucks):
+    waiting = 0
+    for truck in trucks:
+        truck['wait_time'] += 5
+        if truck['is_static'] and not truck['countdown_active']:
+            waiting += 1
+    return waiting
+
+
+def pass_records(trucks):
+    waiting = 0
+    for truck in trucks:
+        truck.wait_time += 5
+        if truck.state == STATIC:
+            waiting += 1
+    return waiting
+
+
+def pass_arrays(arrays):
+    arrays['wait_times'] += 5
+    return int(np.count_nonzero(arrays['states'] == STATIC))
+
+
+def measure(build, run_pass, count):
+    """Bytes per truck allocated by `build` and the best time of one access pass"""
+    tracemalloc.start()
+    trucks = build(count)
+    allocated = tracemalloc.get_traced_memory()[0]
+    tracemalloc.stop()
+
+    best = float('inf')
+    for _ in range(PASSES):
+        start = time.perf_counter()
+        run_pass(trucks)
+        best = min(best, time.perf_counter() - start)
+    return allocated / count, best
+
+
+def main(argv):
+    counts = [int(arg) for arg in argv] or DEFAULT_COUNTS
+    layouts = [('dict', build_dicts, pass_dicts),
+               ('Truck', build_records, pass_records),
+               ('numpy', build_arrays, pass_arrays)]
+    print(f"{'trucks':>9} | {'layout':>6} | {'bytes/truck':>11} | {'pass ms':>9}")
+    for count in counts:
+        for name, build, run_pass in layouts:
+            per_truck, seconds = measure(build, run_pass, count)
+            print(f"{count:>9} | {name:>6} | {per_truck:>11.1f} | {seconds * 1000:>9.2f}")
+
+
+if __name__ == "__main__":
+    main(sys.argv[1:])
@@ -0,0 +1,267 @@
+"""Fit the static-truck parameters to observed crossing times
+
+Usage:
+    python calibrate.py day1.txt day2.txt --fit static_trucks_count=0:8 \
+        static_duration_periods=2:12 near_static_duration_periods=1:8 \
+        min_unstick_spaces=1:4 max_unstick_spaces=3:8 --candidates 500 --cache calibration.jsonl
+
+Each observed log is one clearing of a full queue: the crossing time of every truck
+that was in it, one per line, as seconds or ISO 8601 timestamps. Times are taken
+relative to the first crossing of each log, so clocks need not be aligned.
+
+A candidate's simulated curve is the median crossing time of the k-th truck over
+seeded replications, and its error the mean absolute difference in seconds from
+the observed k-th crossing. Every candidate runs on the same replica seeds, so
+candidates differ only by their parameters. A random search over the --fit ranges
+is followed by a local search that moves one parameter by one step at a time while
+the error improves. Curves are cached by parameter point, in memory and in the
+--cache file, so no point is simulated twice, within a run or across runs.
+
+initial_trucks_to_pass only changes ETA predictions, not when trucks cross, so it
+cannot be fitted from crossing times.
+"""
+import argparse
+import json
+import math
+import os
+import random
+from concurrent.futures import ProcessPoolExecutor
+
+from arrivals import ReplayArrivals
+from montecarlo import percentile
+from queue_engine import BACKENDS, QueueEngine, create_engine, replica_seed
+from sweep import parse_values
+
+# Parameters fitted by default, with the ranges searched when --fit is not given
+DEFAULT_RANGES = {
+    'static_trucks_count': (0, 10),
+    'static_duration_periods': (1, 12),
+    'min_unstick_spaces': (1, 5),
+    'max_unstick_spaces': (3, 8),
+}
+
+
+def load_crossing_times(path):
+    """Crossing times in a log, in seconds after its first crossing"""
+    times = sorted(ReplayArrivals(path))
+    return [time - times[0] for time in times]
+
+
+def observed_curve(logs):
+    """Mean crossing time of the k-th truck over every log that has a k-th truck"""
+    curve = []
+    for rank in range(max(len(log) for log in logs)):
+        times = [log[rank] for log in logs if rank < len(log)]
+        curve.append(sum(times) / len(times))
+    return curve
+
+
+def simulate_curve(params, replications, seed=0, backend='python', max_ticks=100000):
+    """Median crossing time of the k-th truck, after the first, over seeded replications
+
+    Ranks that half or more of the replications never reach (deadlock or
+    max_ticks) are math.inf.
+    """
+    runs = []
+    for replication in range(replications):
+        engine = create_engine(backend, seed=replica_seed(seed, replication), **params)
+        times = [result['time_elapsed'] for result in engine.iter_until_empty(max_ticks)
+                 for _ in result['crossed_ids']]
+        runs.append([time - times[0] for time in times])
+    ranks = max(len(times) for times in runs)
+    return [percentile(sorted(times[rank] if rank < len(times) else math.inf for times in runs), 50)
+            for rank in range(ranks)]
+
+
+def curve_error(simulated, observed):
+    """Mean absolute difference in seconds between two crossing-time curves"""
+    if len(simulated) < len(observed):
+        return math.inf
+    return sum(abs(s - o) for s, o in zip(simulated, observed)) / len(observed)
+
+
+def point_key(params):
+    """Stable cache key of a full parameter point"""
+    return json.dumps(params, sort_keys=True)
+
+
+def _simulate_task(args):
+    return simulate_curve(*args)
+
+
+class Calibrator:
+    """Random plus local search over parameter ranges with cached, parallel evaluation"""
+
+    def __init__(self, observed, fixed, ranges, replications=20, seed=0, backend='python',
+                 processes=None, cache_path=None, max_ticks=100000):
+        self.observed = observed
+        self.fixed = fixed
+        self.ranges = ranges
+        self.replications = replications
+        self.seed = seed
+        self.backend = backend
+        self.processes = processes
+        self.max_ticks = max_ticks
+        self.executor = None
+
+        # Simulated curves by point_key, shared by every search stage
+        self.cache = {}
+        self.cache_hits = 0
+        self.cache_file = None
+        if cache_path:
+            if os.path.exists(cache_path):
+                with open(cache_path) as f:
+                    for line in f:
+                        try:
+                            entry = json.loads(line)
+                        except ValueError:
+                            continue  # torn last line of an interrupted run
+                        self.cache[entry['key']] = entry['curve']
+            self.cache_file = open(cache_path, 'a')
+        self.errors = {}
+
+    def full_point(self, candidate):
+        """Engine parameters of a candidate: fixed values, then the fitted ones"""
+        params = dict(self.fixed)
+        params.update(candidate)
+        if params.get('min_unstick_spaces', 3) > params.get('max_unstick_spaces', 6):
+            params['min_unstick_spaces'], params['max_unstick_spaces'] = (
+                params.get('max_unstick_spaces', 6), params.get('min_unstick_spaces', 3))
+        return params
+
+    def cache_key(self, params):
+        return point_key({'params': params, 'replications': self.replications,
+                          'seed': self.seed, 'backend': self.backend,
+                          'max_ticks': self.max_ticks})
+
+    def evaluate(self, candidates):
+        """Errors of candidates, simulating only the points not cached yet, in parallel"""
+        points = [self.full_point(candidate) for candidate in candidates]
+        keys = [self.cache_key(params) for params in points]
+        todo = {}
+        for key, params in zip(keys, points):
+            if key in self.cache or key in todo:
+                self.cache_hits += 1
+            else:
+                todo[key] = params
+
+        tasks = [(params, self.replications, self.seed, self.backend, self.max_ticks)
+                 for params in todo.values()]
+        if self.processes == 1:
+            curves = map(_simulate_task, tasks)
+        else:
+            if self.executor is None:
+                self.executor = ProcessPoolExecutor(max_workers=self.processes)
+            workers = self.processes or os.cpu_count() or 1
+            curves = self.executor.map(_simulate_task, tasks,
+                                       chunksize=max(1, len(tasks) // (4 * workers)))
+        for key, curve in zip(todo, curves):
+            self.cache[key] = curve
+            if self.cache_file is not None:
+                self.cache_file.write(json.dumps({'key': key, 'curve': curve}) + "\n")
+        if self.cache_file is not None:
+            self.cache_file.flush()
+
+        errors = []
+        for key, params in zip(keys, points):
+            error = curve_error(self.cache[key], self.observed)
+            self.errors[point_key(params)] = (error, params)
+            errors.append(error)
+        return errors
+
+    def random_candidates(self, count, rng):
+        return [{name: rng.randint(low, high) for name, (low, high) in self.ranges.items()}
+                for _ in range(count)]
+
+    def neighbours(self, candidate):
+        """Candidates one step away in a single fitted parameter, within its range"""
+        for name, (low, high) in self.ranges.items():
+            for step in (-1, 1):
+                value = candidate[name] + step
+                if low <= value <= high:
+                    yield {**candidate, name: value}
+
+    def search(self, candidates=200, max_rounds=50):
+        """Random search, then local search from the best candidate; returns the best"""
+        rng = random.Random(self.seed)
+        batch = self.random_candidates(candidates, rng)
+        errors = self.evaluate(batch)
+        best_error, best = min(zip(errors, batch), key=lambda pair: pair[0])
+
+        for _ in range(max_rounds):
+            batch = list(self.neighbours(best))
+            if not batch:
+                break
+            error, candidate = min(zip(self.evaluate(batch), batch), key=lambda pair: pair[0])
+            if error >= best_error:
+                break
+            best_error, best = error, candidate
+        return best_error, self.full_point(best)
+
+    def ranking(self, top=10):
+        """The best evaluated points so far, as (error, params)"""
+        return sorted(self.errors.values(), key=lambda pair: pair[0])[:top]
+
+    def close(self):
+        if self.executor is not None:
+            self.executor.shutdown()
+        if self.cache_file is not None:
+            self.cache_file.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Fit static-truck parameters to observed crossings")
+    parameters = QueueEngine.PARAMETERS
+    parser.add_argument('logs', nargs='+', help="Observed crossing-time logs, one run each")
+    parser.add_argument('--fit', nargs='+', metavar='NAME=LOW:HIGH',
+                        type=lambda spec: parse_values(spec, parameters),
+                        help="Parameters to fit and their inclusive ranges")
+    parser.add_argument('--set', nargs='+', default=[], metavar='NAME=VALUE',
+                        type=lambda spec: parse_values(spec, parameters),
+                        help="Fixed parameters (default max_queue_length: the longest log)")
+    parser.add_argument('--candidates', type=int, default=200, help="Random candidates to start from")
+    parser.add_argument('--rounds', type=int, default=50, help="Local search rounds at most")
+    parser.add_argument('--replications', type=int, default=20)
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--processes', type=int, default=None)
+    parser.add_argument('--backend', default='python', choices=list(BACKENDS))
+    parser.add_argument('--max-ticks', type=int, default=100000)
+    parser.add_argument('--cache', default=None, help="JSON-lines cache of simulated points")
+    parser.add_argument('--output', default=None, help="Write the result as JSON")
+    args = parser.parse_args(argv)
+
+    logs = [load_crossing_times(path) for path in args.logs]
+    observed = observed_curve(logs)
+    ranges = {}
+    for name, values in args.fit or DEFAULT_RANGES.items():
+        ranges[name] = values if isinstance(values, tuple) else (min(values), max(values))
+    fixed = {'max_queue_length': len(observed)}
+    fixed.update((name, values[0]) for name, values in args.set)
+
+    with Calibrator(observed, fixed, ranges, args.replications, args.seed, args.backend,
+                    args.processes, args.cache, args.max_ticks) as calibrator:
+        error, best = calibrator.search(args.candidates, args.rounds)
+        result = {
+            'best': best,
+            'error_seconds': error,
+            'points_evaluated': len(calibrator.errors),
+            'cache_hits': calibrator.cache_hits,
+            'top': [{'error_seconds': e, 'params': p} for e, p in calibrator.ranking()],
+        }
+
+    print(f"Best fit (mean abs error {error:.1f}s over {len(observed)} trucks): "
+          + ", ".join(f"{name}={best[name]}" for name in ranges))
+    print(f"{result['points_evaluated']} points evaluated, {result['cache_hits']} cache hits")
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump(result, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
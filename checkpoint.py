@@ -0,0 +1,120 @@
+"""Compact binary checkpoints of a queue engine's full state
+
+A checkpoint holds the engine parameters and counters, its random stream and one
+little-endian int64 column per truck field (see queue_engine.TRUCK_COLUMNS), so it
+loads without replaying any ticks. Load the same checkpoint with different seeds
+to run what-if branches from an expensive warm-up state:
+
+    data = dumps(engine)             # or save(engine, path)
+    branch = loads(data, seed=7)     # same queue state, new random stream
+"""
+import json
+import random
+import struct
+import sys
+from array import array
+
+from queue_engine import BACKENDS, TRUCK_COLUMNS, engine_class
+
+MAGIC = b'BQCP'
+VERSION = 1
+# Magic, format version and length of the JSON header that follows
+PREFIX = struct.Struct('<4sHI')
+
+
+def backend_name(engine):
+    """Name of the backend an engine instance belongs to"""
+    for name, (module_name, class_name) in BACKENDS.items():
+        if type(engine).__module__ == module_name and type(engine).__name__ == class_name:
+            return name
+    raise ValueError(f"{type(engine).__name__} is not a registered engine backend")
+
+
+def _int64_bytes(column):
+    """Little-endian int64 bytes of a list or NumPy array"""
+    if hasattr(column, 'astype'):
+        return column.astype('<i8').tobytes()
+    values = array('q', column)
+    if sys.byteorder == 'big':
+        values.byteswap()
+    return values.tobytes()
+
+
+def _int64_array(data):
+    values = array('q')
+    values.frombytes(data)
+    if sys.byteorder == 'big':
+        values.byteswap()
+    return values
+
+
+def dumps(engine):
+    """Serialize the full engine state to bytes"""
+    columns = engine.columns()
+    count = len(columns['ids'])
+    rng_version, mt_state, gauss_next = engine.rng.getstate()
+    header = json.dumps({
+        'backend': backend_name(engine),
+        'params': {name: getattr(engine, name) for name in engine.PARAMETERS},
+        'counters': {name: getattr(engine, name) for name in engine.COUNTERS},
+        'seed': engine.seed,
+        'rng_version': rng_version,
+        'gauss_next': gauss_next,
+        'trucks': count,
+    }).encode()
+
+    mt = array('I', mt_state)
+    if sys.byteorder == 'big':
+        mt.byteswap()
+    parts = [PREFIX.pack(MAGIC, VERSION, len(header)), header, mt.tobytes()]
+    parts.extend(_int64_bytes(columns[name]) for name in TRUCK_COLUMNS)
+    return b''.join(parts)
+
+
+def loads(data, backend=None, seed=None):
+    """Rebuild an engine from dumps() output
+
+    `backend` loads the state into another backend than the one it was saved from;
+    `seed` replaces the saved random stream with a fresh one for a what-if branch.
+    """
+    data = memoryview(data)
+    magic, version, header_length = PREFIX.unpack_from(data)
+    if magic != MAGIC or version != VERSION:
+        raise ValueError("Not a queue engine checkpoint (or an unsupported version)")
+    offset = PREFIX.size
+    header = json.loads(bytes(data[offset:offset + header_length]))
+    offset += header_length
+
+    mt = array('I')
+    mt_size = 625 * mt.itemsize
+    mt.frombytes(data[offset:offset + mt_size])
+    if sys.byteorder == 'big':
+        mt.byteswap()
+    offset += mt_size
+
+    column_size = header['trucks'] * 8
+    columns = {}
+    for name in TRUCK_COLUMNS:
+        columns[name] = _int64_array(data[offset:offset + column_size])
+        offset += column_size
+
+    if seed is None:
+        rng_state = (header['rng_version'], tuple(mt), header['gauss_next'])
+        engine_seed = header['seed']
+    else:
+        engine_seed = seed
+        rng_state = random.Random(seed).getstate()
+    return engine_class(backend or header['backend']).restore(
+        header['params'], header['counters'], engine_seed, rng_state, columns)
+
+
+def save(engine, path):
+    """Write a checkpoint of the engine to a file"""
+    with open(path, 'wb') as f:
+        f.write(dumps(engine))
+
+
+def load(path, backend=None, seed=None):
+    """Read an engine back from a checkpoint file (see loads)"""
+    with open(path, 'rb') as f:
+        return loads(f.read(), backend, seed)
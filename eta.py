@@ -0,0 +1,43 @@
+import bisect
+from collections import namedtuple
+
+
+class EtaIndex(namedtuple('EtaIndex', ['move_interval', 'positions', 'delays'])):
+    """Immutable per-position ETA lookup built once per tick
+
+    A truck's ETA is its position times the move interval plus the remaining
+    countdowns of the blocking static trucks at or ahead of its position (once
+    enough trucks have crossed for static delays to count). `positions` holds the
+    positions of those blocking trucks, front to back, and `delays` the running
+    sum of their remaining delays in seconds, so one lookup is a binary search.
+    """
+    __slots__ = ()
+
+    @classmethod
+    def build(cls, move_interval, countdowns):
+        """Build the index from (position, static_remaining) pairs in position order"""
+        positions = []
+        delays = []
+        total = 0
+        for position, static_remaining in countdowns:
+            total += static_remaining * move_interval
+            positions.append(position)
+            delays.append(total)
+        return cls(move_interval, tuple(positions), tuple(delays))
+
+    def eta_at(self, position):
+        """ETA in seconds of a truck at a position"""
+        blocking = bisect.bisect_right(self.positions, position)
+        return position * self.move_interval + (self.delays[blocking - 1] if blocking else 0)
+
+    def etas_at(self, positions):
+        """ETAs of trucks at ascending positions, merging instead of searching"""
+        etas = []
+        blocking = 0
+        delay = 0
+        for position in positions:
+            while blocking < len(self.positions) and self.positions[blocking] <= position:
+                delay = self.delays[blocking]
+                blocking += 1
+            etas.append(position * self.move_interval + delay)
+        return etas
@@ -0,0 +1,338 @@
+import bisect
+import math
+
+from queue_engine import QueueEngine
+from truck import COUNTDOWN, MOVING, STATIC, Truck
+
+
+class EventQueueEngine(QueueEngine):
+    """Next-event queue engine that jumps over ticks in which nothing but the clocks change
+
+    The rules are those of QueueEngine, but a tick only touches the trucks that can
+    change: static trucks, the run of moving trucks at the front of the queue and
+    "loose" trucks that may have a gap ahead of them (trucks that just became
+    movable). Every other truck sits packed right behind the truck ahead of it and
+    cannot move. Wait times are kept lazily as the tick clock minus the time the
+    truck joined, and written back into the truck records when they are read.
+
+    When the front of the queue is held by a static truck counting down and nothing
+    else can move or start a countdown, run() and run_until_empty() skip straight to
+    the tick on which the next countdown ends. Unstick thresholds that would have been
+    drawn during the skipped ticks are still drawn, so seeded runs stay identical to
+    QueueEngine.
+    """
+
+    def initialize_queue(self):
+        """Initialize the truck queue and the event bookkeeping"""
+        self.wait_clock = 0
+        super().initialize_queue()
+        self.wait_origins = {truck.id: 0 for truck in self._trucks}
+        self.static_trucks = [truck for truck in self._trucks if truck.state != MOVING]
+        self.loose_ids = set()
+
+    @property
+    def trucks(self):
+        """Trucks sorted by position, with their lazy wait times brought up to date"""
+        for truck in self._trucks:
+            truck.wait_time = self.wait_clock - self.wait_origins[truck.id]
+        return self._trucks
+
+    @trucks.setter
+    def trucks(self, trucks):
+        self._trucks = trucks
+
+    def update_queue(self):
+        """Update truck positions and states, returning the trucks that crossed"""
+        trucks = self._trucks
+        if not trucks:
+            return []
+        profiler = self.profiler
+
+        # Update wait times for all trucks (lazily, by advancing the shared clock)
+        self.wait_clock += self.move_interval
+        if profiler:
+            profiler.mark('wait_update')
+
+        # Step 1: Check empty spots ahead for each waiting static truck. The
+        # threshold is at most max_unstick_spaces, so only the few slots right
+        # ahead need looking at
+        countdowns_started = 0
+        for truck in self.static_trucks:
+            if truck.state == STATIC:
+                # Random threshold between min_unstick_spaces and max_unstick_spaces
+                required_spaces = self.rng.randint(self.min_unstick_spaces, self.max_unstick_spaces)
+
+                if self._has_free_run(truck.position, required_spaces):
+                    truck.state = COUNTDOWN
+                    countdowns_started += 1
+        if profiler:
+            profiler.mark('countdown_activation')
+
+        # Step 2: Update static truck timers
+        trucks_released = 0
+        for truck in self.static_trucks:
+            if truck.state == COUNTDOWN and truck.static_remaining > 0:
+                truck.static_remaining -= 1
+                if truck.static_remaining <= 0:
+                    truck.state = MOVING
+                    self.loose_ids.add(truck.id)
+                    trucks_released += 1
+        if trucks_released:
+            self.static_trucks = [truck for truck in self.static_trucks if truck.state != MOVING]
+        if profiler:
+            profiler.mark('timer_decrement')
+
+        # Step 3: Find the first static truck with an active countdown
+        blocking_position = self._blocking_position()
+        if profiler:
+            profiler.mark('blocking_detection')
+
+        # Step 4: Walk each run of trucks that can move, starting from the front of
+        # the queue and from every loose truck that is not blocked
+        heads = sorted(self.trucks_by_id[truck_id].position for truck_id in self.loose_ids)
+        trucks_to_remove = []
+        trucks_moved = 0
+        walked_until = 0
+        for head_position in [trucks[0].position] + heads:
+            if blocking_position is not None and head_position > blocking_position:
+                break
+            index = self._index_of(head_position)
+            if index < walked_until:
+                continue
+            previous_position = trucks[index - 1].position if index else -1
+
+            while index < len(trucks):
+                truck = trucks[index]
+                current_position = truck.position
+                self.loose_ids.discard(truck.id)
+
+                # Handle trucks at the border (position 0)
+                if current_position == 0:
+                    if truck.state != STATIC:
+                        trucks_to_remove.append(truck)
+                        self.trucks_crossed += 1
+                    previous_position = 0
+                    index += 1
+                    continue
+
+                # Static trucks never move and trucks packed behind the truck ahead
+                # stay put, as does the rest of their run
+                target_position = previous_position + 1
+                if truck.state != MOVING or target_position == current_position:
+                    break
+                self.slots[current_position] = None
+                self.slots[target_position] = truck
+                truck.position = target_position
+                previous_position = target_position
+                trucks_moved += 1
+                index += 1
+            walked_until = index + 1
+        if profiler:
+            profiler.mark('movement')
+
+        # Step 5: Remove trucks that crossed border (only the front truck can cross)
+        for truck in trucks_to_remove:
+            truck.wait_time = self.wait_clock - self.wait_origins.pop(truck.id)
+            self.slots[truck.position] = None
+            del self.trucks_by_id[truck.id]
+            if truck.state != MOVING:
+                self.static_trucks.remove(truck)
+        del trucks[:len(trucks_to_remove)]
+
+        # Step 6: Colors are derived from the truck state when drawing
+        if profiler:
+            profiler.mark('removal')
+            trucks_blocked = 0
+            if blocking_position is not None:
+                trucks_blocked = len(trucks) - self._index_of(blocking_position) - 1
+            profiler.count(countdowns_started=countdowns_started, trucks_released=trucks_released,
+                           trucks_moved=trucks_moved, trucks_blocked=trucks_blocked,
+                           trucks_crossed=len(trucks_to_remove))
+        return trucks_to_remove
+
+    def load_columns(self, columns):
+        """Replace the queue with trucks rebuilt from columns and reset the event bookkeeping"""
+        super().load_columns(columns)
+        self.wait_clock = 0
+        self.wait_origins = {truck.id: -truck.wait_time for truck in self._trucks}
+        self.static_trucks = [truck for truck in self._trucks if truck.state != MOVING]
+        # Any moving truck may have a gap ahead of it; the first tick settles them
+        self.loose_ids = {truck.id for truck in self._trucks if truck.state == MOVING}
+
+    def tail_position(self):
+        """Position a truck joining the back of the queue takes (may be past capacity)"""
+        return self._trucks[-1].position + 1 if self._trucks else 0
+
+    def add_truck(self, truck_id=None, static_remaining=0):
+        """Join a truck at the back of the queue; returns it, or None when the queue is full"""
+        position = self.tail_position()
+        if position >= self.max_queue_length:
+            return None
+        if truck_id is None:
+            truck_id = self.next_truck_id
+            self.next_truck_id += 1
+
+        truck = Truck(truck_id, position, static_remaining)
+        self._trucks.append(truck)
+        self.slots[position] = truck
+        self.trucks_by_id[truck_id] = truck
+        self.wait_origins[truck_id] = self.wait_clock
+        if truck.state != MOVING:
+            self.static_trucks.append(truck)
+        self._eta_index = None
+        return truck
+
+    def pop_back(self):
+        """Remove and return the truck at the back of the queue, or None if it is empty"""
+        if not self._trucks:
+            return None
+        truck = self._trucks.pop()
+        truck.wait_time = self.wait_clock - self.wait_origins.pop(truck.id)
+        self.slots[truck.position] = None
+        del self.trucks_by_id[truck.id]
+        self.loose_ids.discard(truck.id)
+        if truck.state != MOVING:
+            self.static_trucks.pop()
+        self._eta_index = None
+        return truck
+
+    def _has_free_run(self, position, spaces):
+        """Check whether at least `spaces` slots directly in front of a position are empty"""
+        if position < spaces:
+            return False
+        slots = self.slots
+        for ahead in range(position - spaces, position):
+            if slots[ahead] is not None:
+                return False
+        return True
+
+    def _blocking_position(self):
+        """Position of the first static truck with an active countdown, or None"""
+        for truck in self.static_trucks:
+            if truck.state == COUNTDOWN:
+                return truck.position
+        return None
+
+    def _index_of(self, position):
+        """Index in the position-sorted truck list of the first truck at or behind a position"""
+        return bisect.bisect_left(self._trucks, position, key=lambda x: x.position)
+
+    def idle_ticks(self):
+        """Number of upcoming ticks in which no truck can move, cross, start or end a countdown
+
+        Returns math.inf when the queue can never change again.
+        """
+        trucks = self._trucks
+        if not trucks:
+            return math.inf
+
+        front = trucks[0]
+        if front.state == MOVING or (front.state == COUNTDOWN and front.position == 0):
+            return 0
+
+        shortest_countdown = math.inf
+        for truck in self.static_trucks:
+            if truck.state == COUNTDOWN:
+                shortest_countdown = min(shortest_countdown, truck.static_remaining)
+            elif self._has_free_run(truck.position, self.min_unstick_spaces):
+                # The countdown may start on the next tick, depending on the draw
+                return 0
+        if shortest_countdown <= 1:
+            return 0
+
+        blocking_position = self._blocking_position()
+        for truck_id in self.loose_ids:
+            position = self.trucks_by_id[truck_id].position
+            if blocking_position is not None and position > blocking_position:
+                continue
+            if position != self.nearest_occupied_ahead(position) + 1:
+                return 0
+
+        return shortest_countdown - 1
+
+    def skip_ticks(self, ticks):
+        """Advance over idle ticks without touching the queue, burning the skipped draws"""
+        self.tick += ticks
+        self.time_elapsed += ticks * self.move_interval
+        self._eta_index = None
+        if self.profiler:
+            self.profiler.skip(ticks)
+        if not self._trucks:
+            return
+        self.wait_clock += ticks * self.move_interval
+
+        waiting_count = 0
+        for truck in self.static_trucks:
+            if truck.state == COUNTDOWN:
+                truck.static_remaining -= ticks
+            else:
+                waiting_count += 1
+        for _ in range(ticks * waiting_count):
+            self.rng.randint(self.min_unstick_spaces, self.max_unstick_spaces)
+
+    def iter_run(self, ticks):
+        """Advance a fixed number of ticks, yielding results only for ticks that ran"""
+        target_tick = self.tick + ticks
+        while self.tick < target_tick:
+            idle = self.idle_ticks()
+            if idle:
+                self.skip_ticks(min(idle, target_tick - self.tick))
+            else:
+                yield self.step()
+
+    def iter_until_empty(self, max_ticks=100000):
+        """Advance until every truck has crossed or the queue deadlocks, skipping idle ticks
+
+        Only ticks that ran are yielded; skipped ticks changed nothing but the clocks.
+        """
+        target_tick = self.tick + max_ticks
+        while self._trucks and self.tick < target_tick:
+            idle = self.idle_ticks()
+            if idle == math.inf:
+                break
+            if idle:
+                self.skip_ticks(min(idle, target_tick - self.tick))
+            else:
+                yield self.step()
+
+    def is_deadlocked(self):
+        """Check whether no future tick can move a truck or start a countdown"""
+        return bool(self._trucks) and self.idle_ticks() == math.inf
+
+    def fork(self, seed=None):
+        """Return an independent copy of the current queue state with its own random stream"""
+        replica = super().fork(seed)
+        replica.wait_origins = dict(self.wait_origins)
+        replica.static_trucks = [truck for truck in replica._trucks if truck.state != MOVING]
+        replica.loose_ids = set(self.loose_ids)
+        return replica
+
+    def queue_length(self):
+        """Return the number of trucks still in the queue"""
+        return len(self._trucks)
+
+    def get_truck(self, truck_id):
+        """Return the truck with the given id, or None if it is not in the queue"""
+        truck = self.trucks_by_id.get(truck_id)
+        if truck is not None:
+            truck.wait_time = self.wait_clock - self.wait_origins[truck_id]
+        return truck
+
+    def truck_at(self, position):
+        """Return the truck occupying a position, or None if the slot is empty"""
+        truck = super().truck_at(position)
+        if truck is not None:
+            truck.wait_time = self.wait_clock - self.wait_origins[truck.id]
+        return truck
+
+    def nearest_occupied_ahead(self, position):
+        """Return the closest occupied position in front of a position, or -1 if none"""
+        index = self._index_of(position)
+        if index == 0:
+            return -1
+        return self._trucks[index - 1].position
+
+    def countdowns(self):
+        """(position, static_remaining) of every static truck counting down, front to back"""
+        return [(truck.position, truck.static_remaining) for truck in self.static_trucks
+                if truck.state == COUNTDOWN]
@@ -0,0 +1,112 @@
+import math
+import os
+from concurrent.futures import ProcessPoolExecutor
+
+from queue_engine import replica_seed
+
+PERCENTILES = (50, 90, 99)
+
+
+def run_replicas(engine, seeds, truck_ids, resample_initial=False, max_ticks=100000):
+    """Run one replica per seed to completion and return crossing times per truck id
+
+    Crossing times are seconds from the forked state; a truck that never crosses
+    (deadlock or max_ticks) gets math.inf.
+    """
+    results = []
+    for seed in seeds:
+        replica = engine.fork(seed)
+        if resample_initial:
+            replica.initialize_queue()
+        start_time = replica.time_elapsed
+        pending = set(truck_ids)
+        crossing_times = dict.fromkeys(truck_ids, math.inf)
+
+        ticks = 0
+        progressing = True
+        while pending and ticks < max_ticks:
+            # Only a tick in which nobody crossed can be the start of a deadlock
+            if not progressing and replica.is_deadlocked():
+                break
+            result = replica.step()
+            ticks += 1
+            progressing = bool(result['crossed_ids'])
+            for truck_id in result['crossed_ids']:
+                if truck_id in pending:
+                    crossing_times[truck_id] = result['time_elapsed'] - start_time
+                    pending.discard(truck_id)
+        results.append(crossing_times)
+    return results
+
+
+def percentile(sorted_values, q):
+    """Linearly interpolated percentile of pre-sorted values (inf-safe)"""
+    if not sorted_values:
+        return math.nan
+    rank = (len(sorted_values) - 1) * q / 100
+    lower = math.floor(rank)
+    upper = math.ceil(rank)
+    if sorted_values[upper] == math.inf:
+        return sorted_values[upper] if rank > lower else sorted_values[lower]
+    return sorted_values[lower] + (sorted_values[upper] - sorted_values[lower]) * (rank - lower)
+
+
+def summarize(times):
+    """Mean and percentiles of crossing times; stalled replicas count as never crossing"""
+    ordered = sorted(times)
+    finished = [t for t in ordered if t != math.inf]
+    summary = {
+        'replicas': len(ordered),
+        'stalled': len(ordered) - len(finished),
+        'mean': sum(finished) / len(finished) if finished else math.nan,
+    }
+    for q in PERCENTILES:
+        summary[f'p{q}'] = percentile(ordered, q)
+    return summary
+
+
+def monte_carlo_eta(engine, replicas=1000, truck_ids=(), seed=0, processes=None,
+                    resample_initial=False, max_ticks=100000):
+    """Estimate crossing-time distributions by running seeded replicas of the queue
+
+    Every replica is forked from the engine's current state with its own seed
+    derived from `seed`, so the same call always gives the same result regardless
+    of the number of processes. With resample_initial=True each replica also
+    redraws the static truck placement from the engine parameters.
+
+    Returns a dict with a 'last_truck' summary plus one summary per requested truck id,
+    each holding mean, p50, p90, p99 (seconds) and the number of stalled replicas.
+    """
+    if resample_initial:
+        last_truck_id = engine.first_truck_id + engine.initial_count() - 1
+    elif engine.queue_length():
+        last_truck_id = engine.trucks[-1].id
+    else:
+        # Requested trucks get the same all-stalled summary as ids missing from a
+        # non-empty queue, so every requested id is always in the report
+        report = {'last_truck': summarize([0] * replicas)}
+        for truck_id in truck_ids:
+            report[truck_id] = summarize([math.inf] * replicas)
+        return report
+    tracked_ids = [last_truck_id] + [truck_id for truck_id in truck_ids if truck_id != last_truck_id]
+
+    seeds = [replica_seed(seed, i) for i in range(replicas)]
+    processes = processes or os.cpu_count() or 1
+    if processes == 1:
+        results = run_replicas(engine, seeds, tracked_ids, resample_initial, max_ticks)
+    else:
+        # A few chunks per worker keeps pickling overhead low while balancing load
+        chunk_size = max(1, math.ceil(replicas / (processes * 4)))
+        chunks = [seeds[i:i + chunk_size] for i in range(0, replicas, chunk_size)]
+        results = []
+        with ProcessPoolExecutor(max_workers=processes) as executor:
+            futures = [executor.submit(run_replicas, engine, chunk, tracked_ids,
+                                       resample_initial, max_ticks)
+                       for chunk in chunks]
+            for future in futures:
+                results.extend(future.result())
+
+    report = {'last_truck': summarize([r[last_truck_id] for r in results])}
+    for truck_id in truck_ids:
+        report[truck_id] = summarize([r[truck_id] for r in results])
+    return report
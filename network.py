@@ -0,0 +1,337 @@
+"""Border network of many queues: parallel lanes per checkpoint, checkpoints in series
+
+Every lane is an ordinary queue engine with the usual static/countdown rules. A truck
+that crosses a lane of one stage (e.g. customs) joins the holding area of the next
+stage (e.g. the weighbridge), from which a lane-choice policy sends it into a lane
+with free space; crossing a lane of the last stage leaves the network. Between ticks,
+a moving truck at the back of a lane may switch to a neighbouring lane that is
+clearly shorter.
+
+Lanes do not interact within a tick, so each tick every lane is stepped at once by a
+lane executor: in-process, or sharded over worker processes that keep their lanes
+for the whole run and only exchange per-lane operations and reports with the network.
+"""
+import math
+import multiprocessing
+import os
+import random
+from collections import deque, namedtuple
+
+from queue_engine import create_engine, new_seed, replica_seed
+
+# One checkpoint: `lanes` parallel queues built from the engine keyword `params`.
+# Trucks arriving from the previous stage become static with `static_probability`.
+StageSpec = namedtuple('StageSpec', ['name', 'lanes', 'params', 'lane_choice',
+                                     'static_probability'],
+                       defaults=({}, 'shortest', 0.0))
+
+
+def shortest_queue(loads, free, rng, last):
+    """Pick the lane with the fewest trucks among lanes with free space"""
+    return min((lane for lane in range(len(loads)) if free[lane] > 0), key=loads.__getitem__)
+
+
+def round_robin(loads, free, rng, last):
+    """Pick the next lane with free space after the previously chosen one"""
+    count = len(loads)
+    for offset in range(1, count + 1):
+        lane = (last + offset) % count
+        if free[lane] > 0:
+            return lane
+
+
+def random_lane(loads, free, rng, last):
+    """Pick a uniformly random lane among lanes with free space"""
+    return rng.choice([lane for lane in range(len(loads)) if free[lane] > 0])
+
+
+LANE_POLICIES = {
+    'shortest': shortest_queue,
+    'round_robin': round_robin,
+    'random': random_lane,
+}
+
+
+def apply_lane_ops(engines, ops):
+    """Apply one tick of operations to a set of lanes and step every lane
+
+    `ops` maps a lane key to {'pop': bool, 'add': [(truck_id, static), ...]}: the back
+    truck is removed first, then trucks join the back (static ones with a duration
+    drawn by the lane, moving within min_unstick_spaces of the border), then the
+    lane is stepped. Returns a report for every lane.
+    """
+    for key, lane_ops in ops.items():
+        engine = engines[key]
+        if lane_ops.get('pop'):
+            engine.pop_back()
+        for truck_id, static in lane_ops.get('add', ()):
+            position = engine.tail_position()
+            static_remaining = 0
+            # A static truck this close to the border could never start its countdown
+            if static and position >= engine.min_unstick_spaces:
+                static_remaining = engine.draw_static_duration(position)
+            engine.add_truck(truck_id, static_remaining)
+
+    reports = {}
+    for key, engine in engines.items():
+        result = engine.step()
+        reports[key] = lane_report(engine, result['crossed_ids'])
+    return reports
+
+
+def lane_report(engine, crossed_ids=()):
+    """Summarize a lane for the network: crossings, occupancy and the truck at the back"""
+    length = engine.queue_length()
+    tail = engine.tail_position()
+    back = engine.truck_at(tail - 1) if length else None
+    return {
+        'crossed_ids': list(crossed_ids),
+        'length': length,
+        'tail': tail,
+        'back': (back.id, back.is_static) if back else None,
+        # A lane that just let a truck through cannot be stuck for good
+        'deadlocked': bool(length) and not crossed_ids and engine.is_deadlocked(),
+    }
+
+
+class SerialLaneExecutor:
+    """Steps every lane in the calling process"""
+
+    def start(self, lane_specs):
+        """Create the lanes from (key, backend, params) specs and return their reports"""
+        self.engines = {key: create_engine(backend, **params) for key, backend, params in lane_specs}
+        return {key: lane_report(engine) for key, engine in self.engines.items()}
+
+    def tick(self, ops):
+        """Apply per-lane operations, step every lane and return the lane reports"""
+        return apply_lane_ops(self.engines, ops)
+
+    def close(self):
+        self.engines = {}
+
+
+def _lane_worker(connection, lane_specs):
+    """Worker process loop: own a shard of lanes and step it once per message"""
+    engines = {key: create_engine(backend, **params) for key, backend, params in lane_specs}
+    connection.send({key: lane_report(engine) for key, engine in engines.items()})
+    while True:
+        ops = connection.recv()
+        if ops is None:
+            break
+        connection.send(apply_lane_ops(engines, ops))
+    connection.close()
+
+
+class ProcessLaneExecutor:
+    """Shards lanes over worker processes that step their lanes in parallel each tick
+
+    Lanes are created inside the workers and stay there, so a tick only sends the
+    operations for each shard and receives compact lane reports back.
+    """
+
+    def __init__(self, processes=None):
+        self.processes = processes or os.cpu_count() or 1
+
+    def start(self, lane_specs):
+        """Start the workers with their shard of (key, backend, params) specs"""
+        shards = [lane_specs[i::self.processes] for i in range(self.processes)]
+        shards = [shard for shard in shards if shard]
+        self.workers = []
+        for shard in shards:
+            parent, child = multiprocessing.Pipe()
+            process = multiprocessing.Process(target=_lane_worker, args=(child, shard), daemon=True)
+            process.start()
+            child.close()
+            self.workers.append((parent, process, {key for key, _, _ in shard}))
+
+        reports = {}
+        for connection, _, _ in self.workers:
+            reports.update(connection.recv())
+        return reports
+
+    def tick(self, ops):
+        """Send each shard its operations, then gather the reports of every shard"""
+        for connection, _, keys in self.workers:
+            connection.send({key: lane_ops for key, lane_ops in ops.items() if key in keys})
+        reports = {}
+        for connection, _, _ in self.workers:
+            reports.update(connection.recv())
+        return reports
+
+    def close(self):
+        for connection, process, _ in self.workers:
+            connection.send(None)
+            connection.close()
+            process.join()
+        self.workers = []
+
+
+class BorderNetwork:
+    """Several checkpoints in series, each made of parallel lanes of queue engines
+
+    Stage 0 lanes start with their initial trucks (a full queue unless the stage
+    params set initial_trucks); later stages start empty and are fed by the crossings
+    of the stage before. Truck ids are unique across the whole network.
+    """
+
+    def __init__(self, stages, backend='python', seed=None, processes=1, switch_margin=3,
+                 switch_probability=0.2):
+        self.stages = [StageSpec(*stage) if not isinstance(stage, StageSpec) else stage
+                       for stage in stages]
+        if len({stage.params.get('move_interval', 5) for stage in self.stages}) > 1:
+            raise ValueError("All stages must share the same move_interval")
+        self.move_interval = self.stages[0].params.get('move_interval', 5)
+        self.backend = backend
+        # A lane only loses its back truck to a neighbour at least this much shorter
+        self.switch_margin = switch_margin
+        self.switch_probability = switch_probability
+
+        # Random stream for lane choice, static arrivals and lane switching; lane
+        # seeds derive from the same seed, drawn when None so a run can be repeated
+        self.seed = new_seed(seed)
+        self.rng = random.Random(self.seed)
+        self.executor = SerialLaneExecutor() if processes == 1 else ProcessLaneExecutor(processes)
+
+        lane_specs = []
+        next_id = 1
+        for stage_index, stage in enumerate(self.stages):
+            for lane in range(stage.lanes):
+                params = dict(stage.params)
+                if stage_index > 0:
+                    params.setdefault('initial_trucks', 0)
+                params['first_truck_id'] = next_id
+                params['seed'] = replica_seed(f"{self.seed}:{stage_index}", lane)
+                capacity = params.get('max_queue_length', 50)
+                initial_trucks = params.get('initial_trucks')
+                next_id += capacity if initial_trucks is None else min(initial_trucks, capacity)
+                lane_specs.append(((stage_index, lane), backend, params))
+        self.next_truck_id = next_id
+
+        self.reports = self.executor.start(lane_specs)
+        self.capacities = {key: params.get('max_queue_length', 50) for key, _, params in lane_specs}
+        self.holding = [deque() for _ in self.stages]
+        self.last_choice = [-1] * len(self.stages)
+        self.pending_ops = {}
+        self.exit_times = {}
+        self.tick = 0
+        self.time_elapsed = 0
+
+    def lane_keys(self, stage_index):
+        """Keys of the lanes of one stage, in lane order"""
+        return [(stage_index, lane) for lane in range(self.stages[stage_index].lanes)]
+
+    def trucks_in_network(self):
+        """Trucks in any lane or holding area"""
+        return (sum(report['length'] for report in self.reports.values())
+                + sum(len(holding) for holding in self.holding))
+
+    def step(self):
+        """Advance every lane by one tick and route the trucks that crossed"""
+        self.reports = self.executor.tick(self.pending_ops)
+        self.tick += 1
+        self.time_elapsed += self.move_interval
+
+        # Route crossings into the next stage's holding area, or out of the network,
+        # in lane order, whichever executor produced the reports
+        exited_ids = []
+        for stage_index in range(len(self.stages)):
+            for key in self.lane_keys(stage_index):
+                crossed_ids = self.reports[key]['crossed_ids']
+                if stage_index + 1 < len(self.stages):
+                    self.holding[stage_index + 1].extend(crossed_ids)
+                else:
+                    exited_ids.extend(crossed_ids)
+        for truck_id in exited_ids:
+            self.exit_times[truck_id] = self.time_elapsed
+
+        # Plan the next tick: lane switches first, then admissions from holding areas
+        self.pending_ops = {}
+        switched = 0
+        for stage_index in range(len(self.stages)):
+            switched += self._plan_switches(stage_index)
+            self._plan_admissions(stage_index)
+
+        return {
+            'tick': self.tick,
+            'time_elapsed': self.time_elapsed,
+            'exited_ids': exited_ids,
+            'lane_switches': switched,
+            'trucks_in_network': self.trucks_in_network(),
+        }
+
+    def _plan_switches(self, stage_index):
+        """Move moving back-of-lane trucks to a clearly shorter neighbouring lane"""
+        keys = self.lane_keys(stage_index)
+        busy = set()
+        switched = 0
+        for lane, key in enumerate(keys):
+            back = self.reports[key]['back']
+            if key in busy or back is None or back[1]:
+                continue
+            tail = self.reports[key]['tail']
+            for neighbour in (lane - 1, lane + 1):
+                if not 0 <= neighbour < len(keys) or keys[neighbour] in busy:
+                    continue
+                target = keys[neighbour]
+                target_tail = self.reports[target]['tail']
+                if (tail - target_tail >= self.switch_margin and target_tail < self.capacities[target]
+                        and self.rng.random() < self.switch_probability):
+                    self.pending_ops[key] = {'pop': True, 'add': []}
+                    self.pending_ops[target] = {'pop': False, 'add': [(back[0], False)]}
+                    busy.update((key, target))
+                    switched += 1
+                    break
+        return switched
+
+    def _plan_admissions(self, stage_index):
+        """Send trucks from a stage's holding area into lanes with free space"""
+        holding = self.holding[stage_index]
+        if not holding:
+            return
+        stage = self.stages[stage_index]
+        policy = LANE_POLICIES[stage.lane_choice]
+        keys = self.lane_keys(stage_index)
+        loads = []
+        free = []
+        for key in keys:
+            added = len(self.pending_ops.get(key, {}).get('add', ()))
+            loads.append(self.reports[key]['length'] + added)
+            free.append(self.capacities[key] - self.reports[key]['tail'] - added)
+
+        while holding and any(slots > 0 for slots in free):
+            lane = policy(loads, free, self.rng, self.last_choice[stage_index])
+            self.last_choice[stage_index] = lane
+            static = self.rng.random() < stage.static_probability
+            lane_ops = self.pending_ops.setdefault(keys[lane], {'pop': False, 'add': []})
+            lane_ops['add'].append((holding.popleft(), static))
+            loads[lane] += 1
+            free[lane] -= 1
+
+    def is_deadlocked(self):
+        """Check whether the trucks left in the network can never leave it"""
+        # Nothing planned for the next tick means every lane that could admit a
+        # waiting truck is full, so only the lanes themselves can still change
+        if self.pending_ops or not self.trucks_in_network():
+            return False
+        return all(report['deadlocked'] for report in self.reports.values() if report['length'])
+
+    def run(self, ticks):
+        """Advance a fixed number of ticks, returning the result of each tick"""
+        return [self.step() for _ in range(ticks)]
+
+    def run_until_empty(self, max_ticks=100000):
+        """Advance until every truck has left the network or it deadlocks"""
+        results = []
+        while self.trucks_in_network() and len(results) < max_ticks and not self.is_deadlocked():
+            results.append(self.step())
+        return results
+
+    def mean_exit_time(self):
+        """Mean time at which trucks that left the network crossed the last stage"""
+        if not self.exit_times:
+            return math.nan
+        return sum(self.exit_times.values()) / len(self.exit_times)
+
+    def close(self):
+        """Stop the lane executor (worker processes, if any)"""
+        self.executor.close()
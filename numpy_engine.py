@@ -0,0 +1,255 @@
+import copy
+import random
+
+import numpy as np
+
+from queue_engine import STATES, TRUCK_COLUMNS, QueueEngine, new_seed
+from snapshots import QueueSnapshot, TruckView
+from truck import COUNTDOWN, MOVING, STATIC, Truck
+
+# Per-truck field arrays, kept aligned and sorted by position
+FIELD_ARRAYS = tuple(TRUCK_COLUMNS)
+
+
+class NumpyQueueEngine(QueueEngine):
+    """Struct-of-arrays queue engine that runs each tick phase as vectorized NumPy operations
+
+    Truck fields live in parallel arrays sorted by position. Unstick thresholds are
+    still drawn from the engine's random.Random in queue order, so a seeded run gives
+    exactly the same result as the dict-based QueueEngine.
+    """
+
+    def initialize_queue(self):
+        """Initialize the truck arrays with position-dependent static durations"""
+        n = self.initial_count()
+        self.next_truck_id = self.first_truck_id + n
+        self.tick = 0
+        self.time_elapsed = 0
+        self.trucks_crossed = 0
+        self._eta_index = None
+
+        self.ids = np.arange(self.first_truck_id, self.first_truck_id + n, dtype=np.int64)
+        self.positions = np.arange(n, dtype=np.int64)
+        self.original_positions = np.arange(n, dtype=np.int64)
+        self.states = np.full(n, MOVING, dtype=np.int8)
+        self.static_remaining = np.zeros(n, dtype=np.int64)
+        self.wait_times = np.zeros(n, dtype=np.int64)
+
+        # Randomly assign static trucks with position-dependent durations
+        for idx, static_remaining in self.draw_static_trucks(n):
+            self.states[idx] = STATIC
+            self.static_remaining[idx] = static_remaining
+
+    def update_queue(self):
+        """Update truck positions and states, returning the trucks that crossed"""
+        count = self.positions.size
+        if not count:
+            return []
+
+        positions = self.positions
+        states = self.states
+        static_remaining = self.static_remaining
+        profiler = self.profiler
+
+        # Update wait times for all trucks
+        self.wait_times += self.move_interval
+        if profiler:
+            profiler.mark('wait_update')
+
+        # Step 1: Static trucks start their countdown when the gap to the truck
+        # ahead reaches a random threshold, drawn in queue order
+        previous_positions = np.empty_like(positions)
+        previous_positions[0] = -1
+        previous_positions[1:] = positions[:-1]
+        waiting = np.flatnonzero(states == STATIC)
+        countdowns_started = 0
+        if waiting.size:
+            randint = self.rng.randint
+            low, high = self.min_unstick_spaces, self.max_unstick_spaces
+            required_spaces = np.array([randint(low, high) for _ in range(waiting.size)])
+            empty_ahead = positions[waiting] - previous_positions[waiting] - 1
+            starting = empty_ahead >= required_spaces
+            states[waiting] = np.where(starting, COUNTDOWN, STATIC)
+            if profiler:
+                countdowns_started = int(np.count_nonzero(starting))
+        if profiler:
+            profiler.mark('countdown_activation')
+
+        # Step 2: Update static truck timers
+        ticking = (states == COUNTDOWN) & (static_remaining > 0)
+        static_remaining[ticking] -= 1
+        released = ticking & (static_remaining <= 0)
+        states[released] = MOVING
+        if profiler:
+            profiler.mark('timer_decrement')
+
+        # Step 3: Every truck behind the first active countdown is blocked
+        active = states == COUNTDOWN
+        movable_count = int(active.argmax()) + 1 if active.any() else count
+        if profiler:
+            profiler.mark('blocking_detection')
+
+        # Step 4: Compact moving trucks toward the front. A moving truck ends up
+        # right behind the truck ahead, so each run of moving trucks packs up
+        # against the nearest static truck in front of it (or the border)
+        crossed = positions[0] == 0 and states[0] != STATIC
+        movable = slice(0, movable_count)
+        static_prefix = states[movable] != MOVING
+        indices = np.arange(movable_count)
+        anchor_indices = np.maximum.accumulate(np.where(static_prefix, indices, -1))
+        anchor_positions = np.where(anchor_indices >= 0, positions[movable][anchor_indices], -1)
+        new_positions = np.where(static_prefix, positions[movable],
+                                 anchor_positions + indices - anchor_indices)
+        if profiler:
+            trucks_moved = int(np.count_nonzero(new_positions != positions[movable]))
+        positions[movable] = new_positions
+        if profiler:
+            profiler.mark('movement')
+
+        # Step 5: Remove the truck that crossed the border (only the front truck can cross)
+        trucks_to_remove = []
+        if crossed:
+            trucks_to_remove.append(self._truck_record(0))
+            self.trucks_crossed += 1
+            self._drop_front()
+
+        # Step 6: Colors are derived from the truck state when drawing
+        if profiler:
+            profiler.mark('removal')
+            profiler.count(countdowns_started=countdowns_started,
+                           trucks_released=int(np.count_nonzero(released)),
+                           trucks_moved=trucks_moved, trucks_blocked=count - movable_count,
+                           trucks_crossed=len(trucks_to_remove))
+
+        return trucks_to_remove
+
+    def snapshot(self):
+        """Return an immutable QueueSnapshot of the current state for other threads"""
+        states = [STATES[code] for code in self.states.tolist()]
+        return QueueSnapshot.from_trucks(self, map(
+            TruckView, self.ids.tolist(), self.positions.tolist(), states,
+            self.static_remaining.tolist(), self.wait_times.tolist()))
+
+    def fork(self, seed=None):
+        """Return an independent copy of the current queue state with its own random stream"""
+        replica = copy.copy(self)
+        replica.seed = new_seed(seed)
+        replica.rng = random.Random(replica.seed)
+        replica.profiler = None
+        for name in FIELD_ARRAYS:
+            setattr(replica, name, getattr(self, name).copy())
+        return replica
+
+    def columns(self):
+        """Per-truck state as parallel integer columns (see TRUCK_COLUMNS), front to back"""
+        return {name: getattr(self, name).copy() for name in FIELD_ARRAYS}
+
+    def load_columns(self, columns):
+        """Replace the queue with the given columns, converted to the field arrays"""
+        for name in FIELD_ARRAYS:
+            dtype = np.int8 if name == 'states' else np.int64
+            setattr(self, name, np.array(columns[name], dtype=dtype))
+        self._eta_index = None
+
+    def tail_position(self):
+        """Position a truck joining the back of the queue takes (may be past capacity)"""
+        return int(self.positions[-1]) + 1 if self.positions.size else 0
+
+    def add_truck(self, truck_id=None, static_remaining=0):
+        """Join a truck at the back of the queue; returns it, or None when the queue is full"""
+        position = self.tail_position()
+        if position >= self.max_queue_length:
+            return None
+        if truck_id is None:
+            truck_id = self.next_truck_id
+            self.next_truck_id += 1
+
+        values = {
+            'ids': truck_id,
+            'positions': position,
+            'original_positions': position,
+            'states': STATIC if static_remaining > 0 else MOVING,
+            'static_remaining': static_remaining,
+            'wait_times': 0,
+        }
+        for name in FIELD_ARRAYS:
+            array = getattr(self, name)
+            setattr(self, name, np.append(array, np.array(values[name], dtype=array.dtype)))
+        self._eta_index = None
+        return self._truck_record(self.positions.size - 1)
+
+    def pop_back(self):
+        """Remove and return the truck at the back of the queue, or None if it is empty"""
+        if not self.positions.size:
+            return None
+        truck = self._truck_record(self.positions.size - 1)
+        for name in FIELD_ARRAYS:
+            setattr(self, name, getattr(self, name)[:-1])
+        self._eta_index = None
+        return truck
+
+    def _drop_front(self):
+        """Remove the front truck from every field array"""
+        for name in FIELD_ARRAYS:
+            setattr(self, name, getattr(self, name)[1:])
+
+    def _truck_record(self, index):
+        """Build a Truck copy of the truck at an array index"""
+        return Truck(int(self.ids[index]), int(self.positions[index]),
+                     int(self.static_remaining[index]), STATES[self.states[index]],
+                     int(self.wait_times[index]), int(self.original_positions[index]))
+
+    @property
+    def trucks(self):
+        """Truck copies of every truck, front to back (built on each access)"""
+        return [self._truck_record(i) for i in range(self.positions.size)]
+
+    def queue_length(self):
+        """Return the number of trucks still in the queue"""
+        return int(self.positions.size)
+
+    def truck_at(self, position):
+        """Return the truck occupying a position, or None if the slot is empty"""
+        index = int(np.searchsorted(self.positions, position))
+        if index < self.positions.size and self.positions[index] == position:
+            return self._truck_record(index)
+        return None
+
+    def get_truck(self, truck_id):
+        """Return the truck with the given id, or None if it is not in the queue"""
+        # Ids are not sorted once trucks are admitted from other lanes (add_truck)
+        indices = np.flatnonzero(self.ids == truck_id)
+        if indices.size:
+            return self._truck_record(int(indices[0]))
+        return None
+
+    def nearest_occupied_ahead(self, position):
+        """Return the closest occupied position in front of a position, or -1 if none"""
+        index = int(np.searchsorted(self.positions, position))
+        if index == 0:
+            return -1
+        return int(self.positions[index - 1])
+
+    def is_deadlocked(self):
+        """Check whether no future tick can move a truck or start a countdown"""
+        positions = self.positions
+        gaps = np.diff(positions, prepend=-1) - 1
+        can_change = np.where(self.states != MOVING,
+                              (self.states == COUNTDOWN) | (gaps >= self.min_unstick_spaces),
+                              (positions == 0) | (gaps > 0))
+        return not can_change.any()
+
+    def countdowns(self):
+        """(position, static_remaining) of every static truck counting down, front to back"""
+        active = self.states == COUNTDOWN
+        return list(zip(self.positions[active].tolist(), self.static_remaining[active].tolist()))
+
+    def all_etas(self):
+        """ETA in seconds of every truck in the queue, keyed by truck id"""
+        index = self.eta_index()
+        etas = self.positions * self.move_interval
+        if index.positions:
+            blocking = np.searchsorted(index.positions, self.positions, side='right')
+            delays = np.concatenate(([0], index.delays))
+            etas += delays[blocking]
+        return dict(zip(self.ids.tolist(), etas.tolist()))
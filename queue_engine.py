@@ -0,0 +1,470 @@
+import bisect
+import copy
+import hashlib
+import importlib
+import random
+
+from eta import EtaIndex
+from snapshots import QueueSnapshot, TruckView
+from truck import COUNTDOWN, MOVING, STATIC, Truck, TruckState
+
+# TruckState members indexed by their integer code
+STATES = tuple(TruckState)
+
+
+# Per-truck state as parallel integer columns, and the Truck attribute behind each
+TRUCK_COLUMNS = {
+    'ids': 'id',
+    'positions': 'position',
+    'original_positions': 'original_position',
+    'states': 'state',
+    'static_remaining': 'static_remaining',
+    'wait_times': 'wait_time',
+}
+
+
+class QueueEngine:
+    """Headless border queue state machine, stepped as fast as the CPU allows"""
+
+    # Constructor parameters and run counters, as saved in checkpoints
+    PARAMETERS = ('max_queue_length', 'move_interval', 'static_trucks_count',
+                  'static_duration_periods', 'near_static_duration_periods',
+                  'min_unstick_spaces', 'max_unstick_spaces', 'initial_trucks_to_pass',
+                  'initial_trucks', 'first_truck_id')
+    COUNTERS = ('tick', 'time_elapsed', 'trucks_crossed', 'next_truck_id')
+
+    def __init__(self, max_queue_length=50, move_interval=5, static_trucks_count=3,
+                 static_duration_periods=4, near_static_duration_periods=None,
+                 min_unstick_spaces=3, max_unstick_spaces=6, initial_trucks_to_pass=4,
+                 initial_trucks=None, first_truck_id=1, seed=None):
+        # Simulation parameters
+        self.max_queue_length = max_queue_length
+        self.move_interval = move_interval  # seconds per tick
+        self.static_trucks_count = static_trucks_count
+        # Longest static duration far from / near the border (default: far // 1.5)
+        self.static_duration_periods = static_duration_periods
+        self.near_static_duration_periods = near_static_duration_periods
+        # A static truck starts its countdown once the free spaces ahead of it reach
+        # a threshold drawn uniformly from this range every tick
+        self.min_unstick_spaces = min_unstick_spaces
+        self.max_unstick_spaces = max_unstick_spaces
+        # Number of trucks to pass before static delays count towards the ETA
+        self.initial_trucks_to_pass = initial_trucks_to_pass
+        # Trucks created by initialize_queue (None: fill the queue) and the first id
+        self.initial_trucks = initial_trucks
+        self.first_truck_id = first_truck_id
+
+        # Random stream used for static placement and unstick thresholds. Without a
+        # seed one is drawn, so every run can be reproduced from engine.seed
+        self.seed = new_seed(seed)
+        self.rng = random.Random(self.seed)
+
+        # Optional instrumentation.TickProfiler timing each update_queue phase
+        self.profiler = None
+
+        # Queue state is built by initialize_queue
+        self.initialize_queue()
+
+    def initialize_queue(self):
+        """Initialize the truck queue with position-dependent static durations"""
+        # Queue state: trucks sorted by position, plus an occupancy array indexed
+        # by position and an id lookup
+        initial_count = self.initial_count()
+        trucks = [Truck(self.first_truck_id + i, i) for i in range(initial_count)]
+
+        # Randomly assign static trucks with position-dependent durations
+        for idx, static_remaining in self.draw_static_trucks(initial_count):
+            trucks[idx].state = STATIC
+            trucks[idx].static_remaining = static_remaining
+
+        self.trucks = trucks
+        self.slots = trucks + [None] * (self.max_queue_length - initial_count)
+        self.trucks_by_id = {truck.id: truck for truck in trucks}
+        self.next_truck_id = self.first_truck_id + initial_count
+        self.tick = 0
+        self.time_elapsed = 0
+        self.trucks_crossed = 0
+        self._eta_index = None
+
+    def initial_count(self):
+        """Number of trucks initialize_queue creates"""
+        if self.initial_trucks is None:
+            return self.max_queue_length
+        return min(self.initial_trucks, self.max_queue_length)
+
+    def draw_static_trucks(self, initial_count):
+        """Pick the initially static queue indices and their static durations"""
+        static_indices = self.rng.sample(range(initial_count),
+                                         min(self.static_trucks_count, initial_count))
+        return [(idx, self.draw_static_duration(idx)) for idx in static_indices]
+
+    def draw_static_duration(self, position):
+        """Draw how many periods a truck stuck at a position stays static"""
+        # Define threshold for "near" vs "far" trucks
+        position_threshold = self.max_queue_length // 2
+
+        # Shorter duration for trucks near border (lower positions)
+        if position <= position_threshold:
+            near_periods = self.near_static_duration_periods
+            if near_periods is None:
+                near_periods = int(self.static_duration_periods // 1.5)
+            return self.rng.randint(1, max(1, near_periods))
+        # Longer duration for trucks far from border (higher positions)
+        return self.rng.randint(1, self.static_duration_periods)
+
+    def tail_position(self):
+        """Position a truck joining the back of the queue takes (may be past capacity)"""
+        return self.trucks[-1].position + 1 if self.trucks else 0
+
+    def free_slots(self):
+        """Number of trucks that can still join the back of the queue"""
+        return max(0, self.max_queue_length - self.tail_position())
+
+    def add_truck(self, truck_id=None, static_remaining=0):
+        """Join a truck at the back of the queue; returns it, or None when the queue is full
+
+        A positive static_remaining makes the truck join static with that many periods.
+        """
+        position = self.tail_position()
+        if position >= self.max_queue_length:
+            return None
+        if truck_id is None:
+            truck_id = self.next_truck_id
+            self.next_truck_id += 1
+
+        truck = Truck(truck_id, position, static_remaining)
+        self.trucks.append(truck)
+        self.slots[position] = truck
+        self.trucks_by_id[truck_id] = truck
+        self._eta_index = None
+        return truck
+
+    def pop_back(self):
+        """Remove and return the truck at the back of the queue, or None if it is empty"""
+        if not self.trucks:
+            return None
+        truck = self.trucks.pop()
+        self.slots[truck.position] = None
+        del self.trucks_by_id[truck.id]
+        self._eta_index = None
+        return truck
+
+    def update_queue(self):
+        """Update truck positions and states, returning the trucks that crossed"""
+        if not self.trucks:
+            return []
+
+        # self.trucks is kept sorted by position (front to back - position 0 is at
+        # border): trucks only move into the gap behind the truck in front of them,
+        # so the order never changes and the truck ahead is always the previous one
+        trucks = self.trucks
+        slots = self.slots
+        profiler = self.profiler
+
+        # Update wait times for all trucks
+        for truck in trucks:
+            truck.wait_time += self.move_interval
+        if profiler:
+            profiler.mark('wait_update')
+
+        # Step 1: Check empty spots ahead for each static truck
+        countdowns_started = 0
+        previous_position = -1
+        for truck in trucks:
+            if truck.state == STATIC:
+                # Empty spaces ahead are the gap to the next occupied position
+                empty_ahead = truck.position - previous_position - 1
+
+                # Random threshold between min_unstick_spaces and max_unstick_spaces
+                required_spaces = self.rng.randint(self.min_unstick_spaces, self.max_unstick_spaces)
+
+                if empty_ahead >= required_spaces:
+                    truck.state = COUNTDOWN
+                    countdowns_started += 1
+            previous_position = truck.position
+        if profiler:
+            profiler.mark('countdown_activation')
+
+        # Step 2: Update static truck timers
+        trucks_released = 0
+        for truck in trucks:
+            if truck.state == COUNTDOWN and truck.static_remaining > 0:
+                truck.static_remaining -= 1
+                if truck.static_remaining <= 0:
+                    truck.state = MOVING
+                    trucks_released += 1
+        if profiler:
+            profiler.mark('timer_decrement')
+
+        # Step 3: Find the first static truck with an active countdown; every truck
+        # behind it is blocked
+        movable_count = len(trucks)
+        for i, truck in enumerate(trucks):
+            if truck.state == COUNTDOWN:
+                movable_count = i + 1
+                break
+        if profiler:
+            profiler.mark('blocking_detection')
+
+        # Step 4: Process movement for all eligible trucks
+        trucks_to_remove = []
+        trucks_moved = 0
+        previous_position = -1
+        for i in range(movable_count):
+            truck = trucks[i]
+            current_position = truck.position
+
+            # Handle trucks at the border (position 0)
+            if current_position == 0:
+                if truck.state != STATIC:
+                    trucks_to_remove.append(truck)
+                    self.trucks_crossed += 1
+                previous_position = 0
+                continue
+
+            # Move non-static trucks to the slot right behind the truck ahead
+            if truck.state == MOVING:
+                target_position = previous_position + 1
+                if target_position != current_position:
+                    slots[current_position] = None
+                    slots[target_position] = truck
+                    truck.position = target_position
+                    trucks_moved += 1
+            previous_position = truck.position
+        if profiler:
+            profiler.mark('movement')
+
+        # Step 5: Remove trucks that crossed border (only the front truck can cross)
+        for truck in trucks_to_remove:
+            slots[truck.position] = None
+            del self.trucks_by_id[truck.id]
+        del trucks[:len(trucks_to_remove)]
+
+        # Step 6: Colors are derived from the truck state when drawing
+        if profiler:
+            profiler.mark('removal')
+            profiler.count(countdowns_started=countdowns_started, trucks_released=trucks_released,
+                           trucks_moved=trucks_moved,
+                           trucks_blocked=len(trucks) + len(trucks_to_remove) - movable_count,
+                           trucks_crossed=len(trucks_to_remove))
+
+        return trucks_to_remove
+
+    def step(self):
+        """Advance the simulation by one tick and return the tick result"""
+        self.tick += 1
+        self.time_elapsed += self.move_interval
+        profiler = self.profiler
+        if profiler:
+            profiler.start_tick()
+        crossed = self.update_queue()
+        if profiler:
+            profiler.end_tick(self.tick)
+        self._eta_index = None
+        return {
+            'tick': self.tick,
+            'time_elapsed': self.time_elapsed,
+            'crossed_ids': [truck.id for truck in crossed],
+            'trucks_crossed': self.trucks_crossed,
+            'trucks_in_queue': self.queue_length()
+        }
+
+    def run(self, ticks):
+        """Advance the simulation by a fixed number of ticks"""
+        return list(self.iter_run(ticks))
+
+    def run_until_empty(self, max_ticks=100000):
+        """Advance until every truck has crossed, the queue deadlocks or max_ticks is hit"""
+        return list(self.iter_until_empty(max_ticks))
+
+    def iter_run(self, ticks):
+        """Like run(), but yield each tick result instead of collecting them"""
+        for _ in range(ticks):
+            yield self.step()
+
+    def iter_until_empty(self, max_ticks=100000):
+        """Like run_until_empty(), but yield each tick result instead of collecting them"""
+        target_tick = self.tick + max_ticks
+        progressing = True
+        while self.queue_length() and self.tick < target_tick:
+            # Only a tick in which nobody crossed can be the start of a deadlock
+            if not progressing and self.is_deadlocked():
+                break
+            result = self.step()
+            progressing = bool(result['crossed_ids'])
+            yield result
+
+    def snapshot(self):
+        """Return an immutable QueueSnapshot of the current state for other threads"""
+        return QueueSnapshot.from_trucks(self, [
+            TruckView(truck.id, truck.position, truck.state, truck.static_remaining, truck.wait_time)
+            for truck in self.trucks])
+
+    def fork(self, seed=None):
+        """Return an independent copy of the current queue state with its own random stream"""
+        replica = copy.copy(self)
+        replica.seed = new_seed(seed)
+        replica.rng = random.Random(replica.seed)
+        replica.profiler = None
+        replica.trucks = [truck.copy() for truck in self.trucks]
+        replica.slots = [None] * len(self.slots)
+        for truck in replica.trucks:
+            replica.slots[truck.position] = truck
+        replica.trucks_by_id = {truck.id: truck for truck in replica.trucks}
+        return replica
+
+    def replica(self, index):
+        """Fork the current state onto the index-th random stream split from engine.seed"""
+        return self.fork(replica_seed(self.seed, index))
+
+    def columns(self):
+        """Per-truck state as parallel integer columns (see TRUCK_COLUMNS), front to back"""
+        trucks = self.trucks
+        return {name: [getattr(truck, attribute) for truck in trucks]
+                for name, attribute in TRUCK_COLUMNS.items()}
+
+    def load_columns(self, columns):
+        """Replace the queue with trucks rebuilt from columns as returned by columns()"""
+        trucks = [Truck(truck_id, position, static_remaining, STATES[state], wait_time,
+                        original_position)
+                  for truck_id, position, original_position, state, static_remaining, wait_time
+                  in zip(*(columns[name] for name in TRUCK_COLUMNS))]
+        self.trucks = trucks
+        self.slots = [None] * self.max_queue_length
+        for truck in trucks:
+            self.slots[truck.position] = truck
+        self.trucks_by_id = {truck.id: truck for truck in trucks}
+        self._eta_index = None
+
+    @classmethod
+    def restore(cls, params, counters, seed, rng_state, columns):
+        """Rebuild an engine from saved parameters, counters, random state and truck columns
+
+        Nothing is replayed: the engine continues exactly where the saved one was.
+        """
+        engine = cls.__new__(cls)
+        for name in cls.PARAMETERS:
+            setattr(engine, name, params[name])
+        engine.seed = seed
+        engine.profiler = None
+        engine.rng = random.Random()
+        engine.rng.setstate(rng_state)
+        engine.load_columns(columns)
+        for name in cls.COUNTERS:
+            setattr(engine, name, counters[name])
+        return engine
+
+    def queue_length(self):
+        """Return the number of trucks still in the queue"""
+        return len(self.trucks)
+
+    def truck_at(self, position):
+        """Return the truck occupying a position, or None if the slot is empty"""
+        if 0 <= position < len(self.slots):
+            return self.slots[position]
+        return None
+
+    def get_truck(self, truck_id):
+        """Return the truck with the given id, or None if it is not in the queue"""
+        return self.trucks_by_id.get(truck_id)
+
+    def nearest_occupied_ahead(self, position):
+        """Return the closest occupied position in front of a position, or -1 if none"""
+        index = bisect.bisect_left(self.trucks, position, key=lambda x: x.position)
+        if index == 0:
+            return -1
+        return self.trucks[index - 1].position
+
+    def free_run_ahead(self, position):
+        """Count the consecutive empty slots directly in front of a position"""
+        return position - self.nearest_occupied_ahead(position) - 1
+
+    def nearest_free_slot(self, position):
+        """Return the slot a moving truck at this position would advance to"""
+        return self.nearest_occupied_ahead(position) + 1
+
+    def is_deadlocked(self):
+        """Check whether no future tick can move a truck or start a countdown"""
+        previous_position = -1
+        for truck in self.trucks:
+            position = truck.position
+            if truck.state != MOVING:
+                # An active countdown always ends; otherwise the gap ahead must reach
+                # the smallest unstick threshold for the countdown to ever start
+                if (truck.state == COUNTDOWN
+                        or position - previous_position - 1 >= self.min_unstick_spaces):
+                    return False
+            elif position == 0 or position - previous_position > 1:
+                return False
+            previous_position = position
+        return True
+
+    def countdowns(self):
+        """(position, static_remaining) of every static truck counting down, front to back"""
+        return [(truck.position, truck.static_remaining) for truck in self.trucks
+                if truck.state == COUNTDOWN]
+
+    def eta_index(self):
+        """Per-position ETA index for the current state, rebuilt only after the queue changed"""
+        if self._eta_index is None:
+            # Add delay only for static trucks with active countdown, once enough
+            # trucks have crossed
+            countdowns = ()
+            if self.trucks_crossed >= self.initial_trucks_to_pass:
+                countdowns = self.countdowns()
+            self._eta_index = EtaIndex.build(self.move_interval, countdowns)
+        return self._eta_index
+
+    def truck_eta(self, truck_id):
+        """ETA in seconds of a truck by id, or None if it is not in the queue"""
+        truck = self.get_truck(truck_id)
+        if truck is None:
+            return None
+        return self.eta_index().eta_at(truck.position)
+
+    def all_etas(self):
+        """ETA in seconds of every truck in the queue, keyed by truck id"""
+        trucks = self.trucks
+        etas = self.eta_index().etas_at([truck.position for truck in trucks])
+        return dict(zip([truck.id for truck in trucks], etas))
+
+    def calculate_eta(self):
+        """Calculate ETA in seconds for the last truck, or None when the queue is empty"""
+        if not self.queue_length():
+            return None
+
+        # The truck at the back of the queue is the last one in position order
+        return self.eta_index().eta_at(self.tail_position() - 1)
+
+
+def new_seed(seed=None):
+    """Return the seed, or a fresh 64-bit seed from the OS when it is None"""
+    return random.SystemRandom().getrandbits(64) if seed is None else seed
+
+
+def replica_seed(base_seed, index):
+    """Derive the seed of one replica from the base seed, independent of chunking"""
+    digest = hashlib.blake2b(f"{base_seed}:{index}".encode(), digest_size=8).digest()
+    return int.from_bytes(digest, "little")
+
+
+BACKENDS = {
+    'python': ('queue_engine', 'QueueEngine'),
+    'numpy': ('numpy_engine', 'NumpyQueueEngine'),
+    'event': ('event_engine', 'EventQueueEngine'),
+}
+
+
+def engine_class(backend='python'):
+    """Return the engine class of the named backend ('python', 'numpy' or 'event')"""
+    try:
+        module_name, class_name = BACKENDS[backend]
+    except KeyError:
+        raise ValueError(f"Unknown engine backend: {backend!r}") from None
+    module = importlib.import_module(module_name)
+    return getattr(module, class_name)
+
+
+def create_engine(backend='python', **params):
+    """Create a queue engine for the named backend ('python', 'numpy' or 'event')"""
+    return engine_class(backend)(**params)
@@ -0,0 +1,245 @@
+"""Recorded runs that open at any tick without reading the whole file
+
+A replay file is a sequence of blocks. Each block starts with a keyframe, a full
+checkpoint of the engine (see checkpoint.py) including its random stream, followed
+by one fixed-width traces.TICK_RECORD per tick up to the next keyframe. A footer
+indexes the keyframes. ReplayTrace memory-maps the file and rebuilds the state at a
+tick from the nearest keyframe at or before it, stepping forward deterministically,
+so a run of millions of ticks opens instantly and any tick is at most one keyframe
+interval of steps away:
+
+    with ReplayRecorder('run.bqrp', engine, keyframe_interval=100) as recorder:
+        recorder.run_until_empty()
+
+    trace = ReplayTrace('run.bqrp')
+    snapshot = trace.snapshot_at(1234)
+
+Only ticks stepped by the engine itself are recorded; trucks added between ticks
+(continuous arrivals) would not be reproduced and are not supported.
+"""
+import bisect
+import mmap
+import struct
+
+import checkpoint
+from traces import TICK_RECORD
+
+MAGIC = b'BQRP'
+VERSION = 1
+# Magic, format version and keyframe interval in ticks
+PREFIX = struct.Struct('<4sHI')
+# Per keyframe: its tick, file offset and checkpoint length
+INDEX_ENTRY = struct.Struct('<qQQ')
+# Offset of the index, number of keyframes, last recorded tick, magic
+TRAILER = struct.Struct('<QQq4s')
+DEFAULT_KEYFRAME_INTERVAL = 100
+
+
+class ReplayRecorder:
+    """Steps an engine and writes every tick to a replay file, with periodic keyframes"""
+
+    def __init__(self, path, engine, keyframe_interval=DEFAULT_KEYFRAME_INTERVAL,
+                 buffer_size=1 << 20):
+        if keyframe_interval < 1:
+            raise ValueError("keyframe_interval must be at least 1")
+        self.engine = engine
+        self.keyframe_interval = keyframe_interval
+        self.file = open(path, 'wb', buffering=buffer_size)
+        self.file.write(PREFIX.pack(MAGIC, VERSION, keyframe_interval))
+        self.index = []
+        self.last_tick = engine.tick
+        self.write_keyframe()
+
+    def write_keyframe(self):
+        """Start a new block with a checkpoint of the current engine state"""
+        data = checkpoint.dumps(self.engine)
+        self.index.append((self.engine.tick, self.file.tell(), len(data)))
+        self.file.write(data)
+
+    def record(self, result):
+        """Append the result of the engine's latest step(); every tick must be recorded"""
+        if result['tick'] != self.last_tick + 1:
+            raise ValueError(f"Expected a record for tick {self.last_tick + 1}, got tick "
+                             f"{result['tick']}; every tick must be stepped and recorded")
+        self.last_tick = result['tick']
+        self.file.write(TICK_RECORD.pack(
+            result['tick'], result['time_elapsed'], len(result['crossed_ids']),
+            result['trucks_crossed'], result['trucks_in_queue']))
+        if self.last_tick - self.index[-1][0] >= self.keyframe_interval:
+            self.write_keyframe()
+
+    def step(self):
+        """Advance the engine one tick and record it"""
+        result = self.engine.step()
+        self.record(result)
+        return result
+
+    def iter_run(self, ticks):
+        """Step and record a fixed number of ticks, yielding each result"""
+        for _ in range(ticks):
+            yield self.step()
+
+    def iter_until_empty(self, max_ticks=100000):
+        """Step and record until the queue is empty or deadlocked, yielding each result
+
+        Unlike the event backend's own runs, idle ticks are stepped too, so the
+        replay has a record for every tick.
+        """
+        engine = self.engine
+        target_tick = engine.tick + max_ticks
+        progressing = True
+        while engine.queue_length() and engine.tick < target_tick:
+            if not progressing and engine.is_deadlocked():
+                break
+            result = self.step()
+            progressing = bool(result['crossed_ids'])
+            yield result
+
+    def run(self, ticks):
+        for _ in self.iter_run(ticks):
+            pass
+
+    def run_until_empty(self, max_ticks=100000):
+        for _ in self.iter_until_empty(max_ticks):
+            pass
+
+    def close(self):
+        """Write the keyframe index and close the file; a replay is unreadable before this"""
+        index_offset = self.file.tell()
+        for entry in self.index:
+            self.file.write(INDEX_ENTRY.pack(*entry))
+        self.file.write(TRAILER.pack(index_offset, len(self.index), self.last_tick, MAGIC))
+        self.file.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+
+class ReplayTrace:
+    """Random access to a recorded run through a memory map
+
+    `backend` replays the run on another backend than the one it was recorded with.
+    The engine returned by seek() is reused by later seeks; take a snapshot() of it
+    to keep a state.
+    """
+
+    def __init__(self, path, backend=None):
+        self.backend = backend
+        self.file = open(path, 'rb')
+        self.data = mmap.mmap(self.file.fileno(), 0, access=mmap.ACCESS_READ)
+        self.view = memoryview(self.data)
+
+        magic, version, self.keyframe_interval = PREFIX.unpack_from(self.data)
+        if magic != MAGIC or version != VERSION:
+            self.close()
+            raise ValueError("Not a replay file (or an unsupported version)")
+        if len(self.data) < PREFIX.size + TRAILER.size:
+            self.close()
+            raise ValueError("Incomplete replay file: the recorder was not closed")
+        index_offset, keyframes, self.last_tick, end_magic = TRAILER.unpack_from(
+            self.data, len(self.data) - TRAILER.size)
+        if end_magic != MAGIC:
+            self.close()
+            raise ValueError("Incomplete replay file: the recorder was not closed")
+
+        self.keyframe_ticks = []
+        self.keyframe_spans = []
+        for tick, offset, length in INDEX_ENTRY.iter_unpack(
+                self.data[index_offset:index_offset + keyframes * INDEX_ENTRY.size]):
+            self.keyframe_ticks.append(tick)
+            self.keyframe_spans.append((offset, length))
+        self.first_tick = self.keyframe_ticks[0]
+        self._engine = None
+
+    def __len__(self):
+        """Number of states in the replay, including the initial one"""
+        return self.last_tick - self.first_tick + 1
+
+    def _block(self, tick):
+        if not self.first_tick <= tick <= self.last_tick:
+            raise IndexError(f"Tick {tick} is outside the replay ({self.first_tick}-{self.last_tick})")
+        return bisect.bisect_right(self.keyframe_ticks, tick) - 1
+
+    def keyframe(self, block):
+        """A fresh engine at the state of one keyframe"""
+        offset, length = self.keyframe_spans[block]
+        return checkpoint.loads(self.view[offset:offset + length], self.backend)
+
+    def tick_record(self, tick):
+        """Counters recorded for a tick, read straight from the map without simulating"""
+        block = self._block(tick)
+        first_tick = self.keyframe_ticks[block]
+        if tick == first_tick:
+            # Keyframe ticks end the previous block
+            if not block:
+                return None
+            block -= 1
+            first_tick = self.keyframe_ticks[block]
+        offset, length = self.keyframe_spans[block]
+        record = TICK_RECORD.unpack_from(
+            self.data, offset + length + (tick - first_tick - 1) * TICK_RECORD.size)
+        return dict(zip(('tick', 'time_elapsed', 'crossed', 'trucks_crossed', 'trucks_in_queue'),
+                        record))
+
+    def seek(self, tick):
+        """The engine at the end of a tick, stepped on from the cached or nearest keyframe state"""
+        block = self._block(tick)
+        engine = self._engine
+        if engine is None or not self.keyframe_ticks[block] <= engine.tick <= tick:
+            engine = self.keyframe(block)
+        while engine.tick < tick:
+            engine.step()
+        self._engine = engine
+        return engine
+
+    def snapshot_at(self, tick):
+        """Immutable QueueSnapshot of the state at the end of a tick"""
+        return self.seek(tick).snapshot()
+
+    def close(self):
+        self._engine = None
+        self.view.release()
+        self.data.close()
+        self.file.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+
+class Playback:
+    """Maps wall-clock time to replay ticks at an adjustable speed
+
+    Speed is in ticks per second of wall-clock time and is independent of the
+    engine's move_interval; negative speeds play backwards. Playback pauses at
+    either end of the replay.
+    """
+
+    def __init__(self, first_tick, last_tick, speed=10.0):
+        self.first_tick = first_tick
+        self.last_tick = last_tick
+        self.speed = speed
+        self.position = float(first_tick)
+        self.playing = False
+
+    @property
+    def tick(self):
+        return int(self.position)
+
+    def seek(self, tick):
+        self.position = float(min(max(tick, self.first_tick), self.last_tick))
+        return self.tick
+
+    def advance(self, seconds):
+        """Move the playhead by the wall-clock time since the last frame; return the tick"""
+        if self.playing:
+            self.seek(self.position + self.speed * seconds)
+            end = self.last_tick if self.speed > 0 else self.first_tick
+            if self.position == end:
+                self.playing = False
+        return self.tick
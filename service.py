@@ -0,0 +1,414 @@
+"""Asyncio service answering what-if ETA queries against queue states
+
+    python service.py --port 8765              # serve on localhost
+    python service.py --demo 300               # stand-in live queue + 300 concurrent queries
+
+The protocol is newline-delimited JSON over TCP; each connection may have many
+requests in flight, answered as they finish. A query names a queue state (as built
+by queue_state()), a perturbation and the trucks to report on:
+
+    {"id": 1, "state": {...}, "perturbation": {"stuck": {"17": 3}}, "truck_ids": [17],
+     "replicas": 100, "seed": 0}
+
+"stuck" makes each listed truck stuck for that many more periods (its countdown
+runs, blocking the trucks behind it); "params" overrides engine parameters such as
+move_interval. The response echoes "id" and holds a Monte Carlo ETA report per
+truck (see montecarlo.py) under "result", or an "error". {"op": "stats"} returns
+the service counters.
+
+Scenarios run on a process pool. Results are kept in an LRU cache keyed by a hash
+of the state, perturbation and run settings, and identical queries that arrive
+while one is being computed wait for that computation instead of starting their own.
+"""
+import argparse
+import asyncio
+import hashlib
+import json
+import multiprocessing
+import random
+import time
+from collections import OrderedDict
+from concurrent.futures import ProcessPoolExecutor
+
+from montecarlo import monte_carlo_eta, percentile
+from queue_engine import BACKENDS, TRUCK_COLUMNS, QueueEngine, create_engine, engine_class
+from truck import COUNTDOWN, MOVING, STATIC
+
+# Parameters a perturbation may override; the rest define the queue layout
+PERTURBABLE_PARAMETERS = ('move_interval', 'static_duration_periods',
+                          'near_static_duration_periods', 'min_unstick_spaces',
+                          'max_unstick_spaces', 'initial_trucks_to_pass')
+# Parameters that may be null, meaning the engine default
+NULLABLE_PARAMETERS = ('near_static_duration_periods', 'initial_trucks')
+# Smallest value each parameter can take and still give a meaningful run
+PARAMETER_MINIMUMS = {
+    'max_queue_length': 0, 'move_interval': 1, 'static_trucks_count': 0,
+    'static_duration_periods': 1, 'near_static_duration_periods': 1,
+    'min_unstick_spaces': 0, 'max_unstick_spaces': 0, 'initial_trucks_to_pass': 0,
+    'initial_trucks': 0,
+}
+DEFAULT_REPLICAS = 100
+MAX_REPLICAS = 10000
+# Longest request line accepted, large enough for states of ~100k trucks
+MAX_LINE_BYTES = 1 << 26
+
+
+def queue_state(engine):
+    """JSON-serializable queue state of an engine, as accepted by the service"""
+    return {
+        'params': {name: getattr(engine, name) for name in engine.PARAMETERS},
+        'counters': {name: getattr(engine, name) for name in engine.COUNTERS},
+        'columns': {name: [int(value) for value in column]
+                    for name, column in engine.columns().items()},
+    }
+
+
+def validate_state(state):
+    """Raise ValueError unless a state is one queue_state() could have produced"""
+    if not isinstance(state, dict):
+        raise ValueError("state must be a JSON object")
+    for section, names in (('params', QueueEngine.PARAMETERS), ('counters', QueueEngine.COUNTERS),
+                           ('columns', tuple(TRUCK_COLUMNS))):
+        values = state.get(section)
+        if not isinstance(values, dict):
+            raise ValueError(f"state {section} must be a JSON object")
+        unknown = set(values) - set(names)
+        missing = set(names) - set(values)
+        if unknown or missing:
+            raise ValueError(f"state {section}: unknown {sorted(unknown)}, missing {sorted(missing)}")
+    for name, value in state['params'].items():
+        _check_parameter(name, value)
+    for name, value in state['counters'].items():
+        if not _is_int(value):
+            raise ValueError(f"{name} must be an integer")
+
+    columns = state['columns']
+    if not all(isinstance(column, list) and all(map(_is_int, column))
+               for column in columns.values()):
+        raise ValueError("state columns must be lists of integers")
+    if len({len(column) for column in columns.values()}) > 1:
+        raise ValueError("state columns must all have the same length")
+    positions = columns['positions']
+    max_queue_length = state['params']['max_queue_length']
+    if positions and not (0 <= positions[0] and positions[-1] < max_queue_length):
+        raise ValueError(f"Truck positions must be within 0-{max_queue_length - 1}")
+    if any(ahead >= behind for ahead, behind in zip(positions, positions[1:])):
+        raise ValueError("Truck positions must be strictly increasing")
+    if len(set(columns['ids'])) != len(columns['ids']):
+        raise ValueError("Truck ids must be unique")
+    if not set(columns['states']) <= {MOVING, STATIC, COUNTDOWN}:
+        raise ValueError("Truck states must be 0 (moving), 1 (static) or 2 (countdown)")
+
+
+def _is_int(value):
+    return isinstance(value, int) and not isinstance(value, bool)
+
+
+def _check_parameter(name, value):
+    if value is None and name in NULLABLE_PARAMETERS:
+        return
+    if not _is_int(value):
+        raise ValueError(f"{name} must be an integer")
+    minimum = PARAMETER_MINIMUMS.get(name)
+    if minimum is not None and value < minimum:
+        raise ValueError(f"{name} must be at least {minimum}")
+
+
+def apply_perturbation(state, perturbation):
+    """Params and columns of a state with a perturbation applied (the state is not changed)"""
+    params = dict(state['params'])
+    for name, value in perturbation.get('params', {}).items():
+        if name not in PERTURBABLE_PARAMETERS:
+            raise ValueError(f"Parameter {name} cannot be perturbed")
+        _check_parameter(name, value)
+        params[name] = value
+    if params['min_unstick_spaces'] > params['max_unstick_spaces']:
+        raise ValueError("min_unstick_spaces must not exceed max_unstick_spaces")
+
+    columns = {name: list(state['columns'][name]) for name in TRUCK_COLUMNS}
+    rows = {truck_id: row for row, truck_id in enumerate(columns['ids'])}
+    for truck_id, periods in perturbation.get('stuck', {}).items():
+        row = rows.get(int(truck_id))
+        if row is None:
+            raise ValueError(f"Truck {truck_id} is not in the queue")
+        if not _is_int(periods):
+            raise ValueError(f"Stuck periods of truck {truck_id} must be an integer")
+        if periods <= 0:
+            continue
+        # A waiting static truck keeps waiting for space; anyone else counts down
+        if columns['states'][row] == MOVING:
+            columns['states'][row] = COUNTDOWN
+        columns['static_remaining'][row] += periods
+    return params, columns
+
+
+def run_scenario(state, perturbation, truck_ids, replicas, seed, backend):
+    """Monte Carlo ETA report for a perturbed state (runs in a worker process)"""
+    params, columns = apply_perturbation(state, perturbation)
+    engine = engine_class(backend).restore(params, state['counters'], seed,
+                                           random.Random(seed).getstate(), columns)
+    report = monte_carlo_eta(engine, replicas, truck_ids, seed=seed, processes=1)
+    return {str(key): summary for key, summary in report.items()}
+
+
+def request_key(state, perturbation, truck_ids, replicas, seed, backend):
+    """Cache key of a query: a hash of everything its result depends on"""
+    payload = json.dumps([state, perturbation, sorted(truck_ids), replicas, seed, backend],
+                         sort_keys=True)
+    return hashlib.sha256(payload.encode()).hexdigest()
+
+
+class WhatIfService:
+    """Runs what-if queries on a worker pool with an LRU result cache and coalescing"""
+
+    def __init__(self, processes=None, cache_size=1024, backend='python'):
+        # Spawned, not forked, so workers never inherit open client sockets (a forked
+        # copy would keep a connection open after the service closes it)
+        self.executor = ProcessPoolExecutor(max_workers=processes,
+                                            mp_context=multiprocessing.get_context('spawn'))
+        self.cache_size = cache_size
+        self.backend = backend
+        self.cache = OrderedDict()
+        # Computations in flight by request key, awaited by every identical query
+        self.in_flight = {}
+        self.connections = set()
+        self.counters = dict.fromkeys(('queries', 'cache_hits', 'coalesced', 'computed',
+                                       'errors', 'evicted'), 0)
+
+    async def query(self, state, perturbation=None, truck_ids=(), replicas=DEFAULT_REPLICAS, seed=0):
+        """ETA report of a scenario, from the cache, a computation in flight or a new one"""
+        perturbation = perturbation or {}
+        truck_ids = [int(truck_id) for truck_id in truck_ids]
+        if not 1 <= replicas <= MAX_REPLICAS:
+            raise ValueError(f"replicas must be between 1 and {MAX_REPLICAS}")
+        validate_state(state)
+        # Rejected here rather than in a worker, and before the cache is consulted
+        apply_perturbation(state, perturbation)
+        missing = set(truck_ids) - set(state['columns']['ids'])
+        if missing:
+            raise ValueError(f"Trucks {sorted(missing)} are not in the queue")
+        self.counters['queries'] += 1
+        key = request_key(state, perturbation, truck_ids, replicas, seed, self.backend)
+
+        if key in self.cache:
+            self.cache.move_to_end(key)
+            self.counters['cache_hits'] += 1
+            return self.cache[key]
+
+        task = self.in_flight.get(key)
+        if task is not None:
+            self.counters['coalesced'] += 1
+        else:
+            task = asyncio.ensure_future(self._compute(key, state, perturbation, truck_ids,
+                                                       replicas, seed))
+            self.in_flight[key] = task
+        # A caller that goes away must not cancel the computation for the others
+        return await asyncio.shield(task)
+
+    async def _compute(self, key, state, perturbation, truck_ids, replicas, seed):
+        loop = asyncio.get_running_loop()
+        try:
+            result = await loop.run_in_executor(self.executor, run_scenario, state, perturbation,
+                                                truck_ids, replicas, seed, self.backend)
+        finally:
+            del self.in_flight[key]
+        self.counters['computed'] += 1
+        self.cache[key] = result
+        if len(self.cache) > self.cache_size:
+            self.cache.popitem(last=False)
+            self.counters['evicted'] += 1
+        return result
+
+    def stats(self):
+        return {**self.counters, 'cached': len(self.cache), 'in_flight': len(self.in_flight)}
+
+    async def respond(self, line):
+        """Response object for one request line"""
+        try:
+            request = json.loads(line)
+        except ValueError:
+            return {'error': "Request is not valid JSON"}
+        if not isinstance(request, dict):
+            return {'error': "Request must be a JSON object"}
+        response = {'id': request.get('id')}
+        try:
+            if request.get('op') == 'stats':
+                response['result'] = self.stats()
+            else:
+                response['result'] = await self.query(
+                    request['state'], request.get('perturbation'), request.get('truck_ids', ()),
+                    request.get('replicas', DEFAULT_REPLICAS), request.get('seed', 0))
+        except Exception as error:
+            # Any failure, including one raised in a worker, is answered so the
+            # client is never left waiting
+            self.counters['errors'] += 1
+            response['error'] = f"{type(error).__name__}: {error}"
+        return response
+
+    async def handle_connection(self, reader, writer):
+        """Answer every request line of a connection, each as soon as it is done"""
+        connection = asyncio.current_task()
+        self.connections.add(connection)
+        pending = set()
+
+        async def answer(line):
+            response = await self.respond(line)
+            writer.write((json.dumps(response) + "\n").encode())
+            await writer.drain()
+
+        try:
+            while line := await reader.readline():
+                if line.strip():
+                    task = asyncio.ensure_future(answer(line))
+                    pending.add(task)
+                    task.add_done_callback(pending.discard)
+            if pending:
+                await asyncio.gather(*pending, return_exceptions=True)
+        except (ConnectionError, ValueError):
+            pass  # client went away, or sent a line longer than MAX_LINE_BYTES
+        finally:
+            for task in pending:
+                task.cancel()
+            writer.close()
+            self.connections.discard(connection)
+
+    async def serve(self, host='127.0.0.1', port=8765):
+        """Start listening; returns the asyncio server"""
+        return await asyncio.start_server(self.handle_connection, host, port,
+                                          limit=MAX_LINE_BYTES)
+
+    async def stop(self, server):
+        """Stop accepting connections, let open ones finish, then stop the workers"""
+        server.close()
+        await server.wait_closed()
+        if self.connections:
+            await asyncio.gather(*self.connections, return_exceptions=True)
+        self.close()
+
+    def close(self):
+        self.executor.shutdown(cancel_futures=True)
+
+
+class WhatIfClient:
+    """Asyncio client multiplexing many concurrent queries over one connection"""
+
+    def __init__(self):
+        self.reader = None
+        self.writer = None
+        self.waiting = {}
+        self.next_id = 0
+        self.listener = None
+
+    async def connect(self, host='127.0.0.1', port=8765):
+        self.reader, self.writer = await asyncio.open_connection(host, port, limit=MAX_LINE_BYTES)
+        self.listener = asyncio.ensure_future(self._listen())
+        return self
+
+    async def _listen(self):
+        while line := await self.reader.readline():
+            response = json.loads(line)
+            future = self.waiting.pop(response.get('id'), None)
+            if future is not None and not future.done():
+                future.set_result(response)
+        for future in self.waiting.values():
+            future.set_exception(ConnectionError("Service closed the connection"))
+
+    async def request(self, **request):
+        """Send a request and wait for its response object"""
+        self.next_id += 1
+        request['id'] = self.next_id
+        future = self.waiting[self.next_id] = asyncio.get_running_loop().create_future()
+        self.writer.write((json.dumps(request) + "\n").encode())
+        await self.writer.drain()
+        return await future
+
+    async def query(self, state, perturbation=None, truck_ids=(), replicas=DEFAULT_REPLICAS, seed=0):
+        """ETA report of a what-if scenario; raises ValueError on a rejected query"""
+        response = await self.request(state=state, perturbation=perturbation or {},
+                                      truck_ids=list(truck_ids), replicas=replicas, seed=seed)
+        if 'error' in response:
+            raise ValueError(response['error'])
+        return response['result']
+
+    async def close(self):
+        self.writer.close()
+        await self.writer.wait_closed()
+        self.listener.cancel()
+
+
+async def demo(queries, processes=None, replicas=DEFAULT_REPLICAS, tick_seconds=0.5):
+    """Serve a stand-in live queue and fire concurrent what-if queries at it
+
+    The stand-in engine steps every tick_seconds and the clients always ask about
+    its newest state, picking a truck near the front and a delay of 1-3 periods.
+    """
+    service = WhatIfService(processes=processes)
+    server = await service.serve(port=0)
+    port = server.sockets[0].getsockname()[1]
+    engine = create_engine('python', max_queue_length=50, static_trucks_count=3, seed=1)
+    live = {'state': queue_state(engine)}
+
+    async def live_queue():
+        while True:
+            await asyncio.sleep(tick_seconds)
+            engine.step()
+            live['state'] = queue_state(engine)
+
+    async def dispatcher(client, rng):
+        state = live['state']
+        truck_id = rng.choice(state['columns']['ids'][:5])
+        start = time.perf_counter()
+        await client.query(state, {'stuck': {str(truck_id): rng.randint(1, 3)}}, [truck_id],
+                           replicas=replicas)
+        return time.perf_counter() - start
+
+    clients = [await WhatIfClient().connect(port=port) for _ in range(8)]
+    ticker = asyncio.ensure_future(live_queue())
+    rng = random.Random(0)
+    start = time.perf_counter()
+    latencies = sorted(await asyncio.gather(*(dispatcher(clients[i % len(clients)], rng)
+                                              for i in range(queries))))
+    elapsed = time.perf_counter() - start
+    ticker.cancel()
+    for client in clients:
+        await client.close()
+    await service.stop(server)
+
+    print(f"{queries} queries in {elapsed:.2f}s | latency p50 {percentile(latencies, 50) * 1000:.0f}ms "
+          f"p90 {percentile(latencies, 90) * 1000:.0f}ms p99 {percentile(latencies, 99) * 1000:.0f}ms")
+    print(json.dumps(service.stats()))
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Serve what-if ETA queries over TCP")
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=8765)
+    parser.add_argument('--processes', type=int, default=None)
+    parser.add_argument('--cache-size', type=int, default=1024)
+    parser.add_argument('--backend', default='python', choices=list(BACKENDS))
+    parser.add_argument('--demo', type=int, metavar='QUERIES',
+                        help="Run concurrent queries against a stand-in live queue and exit")
+    parser.add_argument('--replicas', type=int, default=DEFAULT_REPLICAS, help="Replicas per demo query")
+    args = parser.parse_args(argv)
+
+    if args.demo:
+        asyncio.run(demo(args.demo, args.processes, args.replicas))
+        return
+
+    async def serve_forever():
+        service = WhatIfService(args.processes, args.cache_size, args.backend)
+        server = await service.serve(args.host, args.port)
+        print(f"Serving what-if queries on {args.host}:{args.port}")
+        try:
+            await server.serve_forever()
+        finally:
+            await service.stop(server)
+
+    try:
+        asyncio.run(serve_forever())
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,177 @@
+"""Run the queue simulation from the command line without a display
+
+Usage:
+    python simulate.py --max-queue-length 5000 --static-trucks-count 500 --seed 1 > run.ndjson
+    python simulate.py --backend numpy --trace events --format binary --output crossings.bin
+    python simulate.py --arrival-rate 600 --ticks 10000000 --trace events | gzip > run.ndjson.gz
+    python simulate.py --max-queue-length 500 --replay run.bqrp --output /dev/null
+
+Streams a trace of every tick (or of every crossed truck with --trace events) as
+newline-delimited JSON or binary records (see traces.py), buffered and written as the
+run goes, so traces larger than memory can be written to a file or piped. A summary
+of the run is printed to stderr. --replay also records the run as a replay file
+(see replay.py) that `python Queue_ETA.py run.bqrp` can scrub through. Unlike
+Queue_ETA.py this never imports tkinter.
+"""
+import argparse
+import json
+import sys
+
+from arrivals import DEFAULT_MAX_BACKLOG
+from queue_engine import BACKENDS, create_engine
+from traces import FORMATS, KINDS, WRITERS, open_output
+
+# Engine parameters exposed as flags, with the engine defaults
+ENGINE_FLAGS = {
+    'max_queue_length': 50,
+    'move_interval': 5,
+    'static_trucks_count': 3,
+    'static_duration_periods': 4,
+    'initial_trucks_to_pass': 4,
+    'initial_trucks': None,
+}
+
+
+def iter_arrival_ticks(stream, ticks):
+    """Step a StreamingQueue, yielding engine-style tick results"""
+    engine = stream.engine
+    for _ in range(ticks):
+        records = stream.step()
+        yield {
+            'tick': engine.tick,
+            'time_elapsed': engine.time_elapsed,
+            'crossed_ids': [record['id'] for record in records],
+            'trucks_crossed': engine.trucks_crossed,
+            'trucks_in_queue': engine.queue_length(),
+        }
+
+
+def fill_idle_ticks(results, engine):
+    """Yield every tick's result, adding the idle ticks a backend skipped over
+
+    The event backend does not step ticks in which nothing can happen; they change
+    only the clocks, so their records are rebuilt from the tick before.
+    """
+    tick, time_elapsed = engine.tick, engine.time_elapsed
+    crossed, in_queue = engine.trucks_crossed, engine.queue_length()
+
+    def idle_until(last_tick):
+        for idle_tick in range(tick + 1, last_tick):
+            yield {
+                'tick': idle_tick,
+                'time_elapsed': time_elapsed + (idle_tick - tick) * engine.move_interval,
+                'crossed_ids': [],
+                'trucks_crossed': crossed,
+                'trucks_in_queue': in_queue,
+            }
+
+    for result in results:
+        yield from idle_until(result['tick'])
+        yield result
+        tick, time_elapsed = result['tick'], result['time_elapsed']
+        crossed, in_queue = result['trucks_crossed'], result['trucks_in_queue']
+    yield from idle_until(engine.tick + 1)
+
+
+def run(args, out):
+    """Run the simulation described by parsed arguments, writing its trace to `out`"""
+    params = {name: getattr(args, name) for name in ENGINE_FLAGS}
+    if args.arrival_rate is not None and params['initial_trucks'] is None:
+        params['initial_trucks'] = 0
+    engine = create_engine(args.backend, seed=args.seed, **params)
+
+    profiler = None
+    if args.profile:
+        from instrumentation import TickProfiler
+        profiler = engine.profiler = TickProfiler(
+            profile='cprofile' if args.profile == 'cprofile' else None)
+
+    stream = None
+    recorder = None
+    if args.replay:
+        from replay import ReplayRecorder
+        recorder = ReplayRecorder(args.replay, engine, args.keyframe_interval, args.buffer_size)
+        results = (recorder.iter_run(args.ticks) if args.ticks is not None
+                   else recorder.iter_until_empty(args.max_ticks))
+    elif args.arrival_rate is not None:
+        from arrivals import PoissonArrivals, StreamingQueue
+        stream = StreamingQueue(engine, PoissonArrivals(args.arrival_rate, seed=args.arrival_seed),
+                                static_probability=args.static_probability,
+                                max_backlog=args.max_backlog, seed=args.arrival_seed)
+        results = iter_arrival_ticks(stream, args.ticks)
+    elif args.ticks is not None:
+        results = engine.iter_run(args.ticks)
+    else:
+        results = engine.iter_until_empty(args.max_ticks)
+
+    if args.trace == 'ticks':
+        results = fill_idle_ticks(results, engine)
+
+    writer = WRITERS[args.format](out, args.trace)
+    try:
+        for result in results:
+            writer.write(result)
+    finally:
+        if recorder is not None:
+            recorder.close()
+
+    summary = {
+        'seed': engine.seed,
+        'tick': engine.tick,
+        'time_elapsed': engine.time_elapsed,
+        'trucks_crossed': engine.trucks_crossed,
+        'trucks_in_queue': engine.queue_length(),
+        'deadlocked': bool(engine.queue_length()) and engine.is_deadlocked(),
+    }
+    if stream is not None:
+        summary.update(stream.summary())
+    return summary, profiler
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Run the border queue simulation headless")
+    for name, default in ENGINE_FLAGS.items():
+        parser.add_argument('--' + name.replace('_', '-'), type=int, default=default)
+    parser.add_argument('--backend', default='python', choices=list(BACKENDS))
+    parser.add_argument('--seed', type=int)
+    parser.add_argument('--ticks', type=int, help="Run a fixed number of ticks instead of until empty")
+    parser.add_argument('--max-ticks', type=int, default=100000,
+                        help="Tick limit when running until empty")
+    parser.add_argument('--arrival-rate', type=float, metavar='PER_HOUR',
+                        help="Keep the queue running with Poisson arrivals (requires --ticks)")
+    parser.add_argument('--arrival-seed', type=int)
+    parser.add_argument('--static-probability', type=float)
+    parser.add_argument('--max-backlog', type=int, default=DEFAULT_MAX_BACKLOG,
+                        help="Waiting arrivals kept while the queue is full")
+    parser.add_argument('--trace', default='ticks', choices=KINDS)
+    parser.add_argument('--format', default='ndjson', choices=FORMATS)
+    parser.add_argument('--output', default='-', help="Trace file, or - for stdout")
+    parser.add_argument('--buffer-size', type=int, default=1 << 20, help="Output buffer in bytes")
+    parser.add_argument('--replay', metavar='PATH', help="Also record a replay file for the viewer")
+    parser.add_argument('--keyframe-interval', type=int, default=100,
+                        help="Ticks between replay keyframes")
+    parser.add_argument('--profile', nargs='?', const='phases', choices=['phases', 'cprofile'],
+                        help="Print per-phase timings (and cProfile hot spots) to stderr")
+    args = parser.parse_args(argv)
+    if args.arrival_rate is not None and args.ticks is None:
+        parser.error("--arrival-rate needs --ticks")
+    if args.arrival_rate is not None and args.replay:
+        parser.error("--replay cannot record runs with --arrival-rate")
+    if args.output == '-' and args.format == 'binary' and sys.stdout.isatty():
+        parser.error("refusing to write a binary trace to a terminal; use --output")
+
+    try:
+        with open_output(args.output, args.buffer_size) as out:
+            summary, profiler = run(args, out)
+    except BrokenPipeError:
+        # The reader went away (e.g. `| head`); stop quietly like other shell tools
+        return 1
+
+    print(json.dumps(summary), file=sys.stderr)
+    if profiler is not None:
+        print(profiler.summary_table(), file=sys.stderr)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,82 @@
+import bisect
+import threading
+from collections import namedtuple
+
+from truck import COUNTDOWN, MOVING
+
+
+class TruckView(namedtuple('TruckView', ['id', 'position', 'state', 'static_remaining',
+                                         'wait_time'])):
+    """Immutable view of one truck at the end of a tick"""
+    __slots__ = ()
+
+    @property
+    def is_static(self):
+        return self.state != MOVING
+
+    @property
+    def countdown_active(self):
+        return self.state == COUNTDOWN
+
+
+class QueueSnapshot(namedtuple('QueueSnapshot', ['tick', 'time_elapsed', 'trucks_crossed',
+                                                 'max_queue_length', 'eta', 'trucks', 'positions',
+                                                 'eta_index'])):
+    """Immutable copy of the queue state at the end of a tick, safe to read from any thread
+
+    `trucks` is a tuple of TruckView sorted by position and `positions` the matching
+    tuple of positions. `eta_index` gives the ETA of a truck from its position.
+    """
+    __slots__ = ()
+
+    @classmethod
+    def from_trucks(cls, engine, trucks):
+        """Build a snapshot from position-sorted TruckViews and the engine counters"""
+        trucks = tuple(trucks)
+        return cls(engine.tick, engine.time_elapsed, engine.trucks_crossed,
+                   engine.max_queue_length, engine.calculate_eta(), trucks,
+                   tuple(truck.position for truck in trucks), engine.eta_index())
+
+    def trucks_between(self, first_position, last_position):
+        """Trucks whose position lies in the inclusive range, front to back"""
+        start = bisect.bisect_left(self.positions, first_position)
+        end = bisect.bisect_right(self.positions, last_position)
+        return self.trucks[start:end]
+
+
+class SnapshotChannel:
+    """Latest-wins handoff of snapshots from the simulation thread to the UI thread
+
+    The producer publishes a snapshot per tick; the consumer takes whatever is newest
+    at its own frame rate. Snapshots replaced before they were taken are dropped and
+    counted, so a fast simulation never queues up work for a slow renderer.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._latest = None
+        self._fresh = False
+        self.published = 0
+        self.dropped = 0
+
+    def publish(self, snapshot):
+        """Make a snapshot the newest one, dropping any unread predecessor"""
+        with self._lock:
+            if self._fresh:
+                self.dropped += 1
+            self._latest = snapshot
+            self._fresh = True
+            self.published += 1
+
+    def take(self):
+        """Return the newest snapshot if it has not been taken yet, otherwise None"""
+        with self._lock:
+            if not self._fresh:
+                return None
+            self._fresh = False
+            return self._latest
+
+    def latest(self):
+        """Return the newest snapshot whether or not it was already taken"""
+        with self._lock:
+            return self._latest
@@ -0,0 +1,236 @@
+"""Parameter sweeps over the queue engine with seeded replications
+
+Usage:
+    python sweep.py --grid max_queue_length=50,100 static_trucks_count=3,6 \
+        --replications 50 --output sweep.csv
+    python sweep.py --random 200 static_duration_periods=2:12 max_queue_length=20:200 \
+        --output sweep.csv --npz sweep.npz
+
+Results are appended to the CSV one finished point at a time, so re-running the
+same command after a crash skips every point that is already complete.
+"""
+import argparse
+import csv
+import itertools
+import math
+import os
+import random
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+from queue_engine import create_engine, replica_seed
+
+# Engine parameters that can be swept, with the engine defaults
+SWEEP_PARAMETERS = {
+    'max_queue_length': 50,
+    'move_interval': 5,
+    'static_trucks_count': 3,
+    'static_duration_periods': 4,
+    'initial_trucks_to_pass': 4,
+}
+
+RESULT_COLUMNS = ['replication', 'seed', 'clear_time', 'ticks', 'trucks_crossed',
+                  'stalled', 'mean_crossing_time', 'initial_eta']
+COLUMNS = ['point_id'] + list(SWEEP_PARAMETERS) + RESULT_COLUMNS
+
+
+def grid_points(grid):
+    """Expand {name: [values]} into every combination, filling unswept parameters with defaults"""
+    names = list(grid)
+    for values in itertools.product(*(grid[name] for name in names)):
+        point = dict(SWEEP_PARAMETERS)
+        point.update(zip(names, values))
+        yield point
+
+
+def random_points(ranges, count, seed=0):
+    """Draw points with each parameter uniform over an inclusive (low, high) range or from a list"""
+    rng = random.Random(seed)
+    for _ in range(count):
+        point = dict(SWEEP_PARAMETERS)
+        for name, choices in ranges.items():
+            if isinstance(choices, tuple):
+                point[name] = rng.randint(*choices)
+            else:
+                point[name] = rng.choice(choices)
+        yield point
+
+
+def point_id(point):
+    """Stable identifier of a parameter point, used for resuming and for seeding"""
+    return "|".join(f"{name}={point[name]}" for name in SWEEP_PARAMETERS)
+
+
+def run_point(point, replications, seed=0, backend='python', max_ticks=100000):
+    """Run every replication of one parameter point and return its result rows"""
+    key = point_id(point)
+    rows = []
+    for replication in range(replications):
+        replica = replica_seed(f"{seed}:{key}", replication)
+        engine = create_engine(backend, seed=replica, **point)
+        initial_eta = engine.calculate_eta()
+        results = engine.run_until_empty(max_ticks=max_ticks)
+
+        crossing_times = [result['time_elapsed'] for result in results
+                          for _ in result['crossed_ids']]
+        stalled = engine.queue_length() > 0
+        rows.append({
+            'point_id': key,
+            **point,
+            'replication': replication,
+            'seed': replica,
+            'clear_time': math.inf if stalled else engine.time_elapsed,
+            'ticks': engine.tick,
+            'trucks_crossed': engine.trucks_crossed,
+            'stalled': int(stalled),
+            'mean_crossing_time': (sum(crossing_times) / len(crossing_times)
+                                   if crossing_times else math.nan),
+            'initial_eta': initial_eta,
+        })
+    return rows
+
+
+def load_completed(path, replications):
+    """Return ids of fully written points, dropping partial points and torn lines from the file"""
+    if not os.path.exists(path):
+        return set()
+
+    with open(path, newline='') as f:
+        reader = csv.reader(f)
+        header = next(reader, None)
+        rows = [row for row in reader if len(row) == len(COLUMNS)]
+    if not rows and (header is None or ",".join(COLUMNS).startswith(",".join(header))):
+        # Killed before any point finished: empty, or a header cut off mid-write
+        open(path, 'w').close()
+        return set()
+    if header != COLUMNS:
+        raise ValueError(f"{path} does not look like a sweep output file")
+
+    counts = {}
+    for row in rows:
+        counts[row[0]] = counts.get(row[0], 0) + 1
+    completed = {key for key, count in counts.items() if count >= replications}
+
+    # Rewrite the file when a crash left a partial point or a torn last line
+    kept = [row for row in rows if row[0] in completed]
+    if len(kept) != sum(counts.values()) or not _ends_with_newline(path):
+        with open(path, 'w', newline='') as f:
+            writer = csv.writer(f)
+            writer.writerow(COLUMNS)
+            writer.writerows(kept)
+    return completed
+
+
+def _ends_with_newline(path):
+    """Check whether the last write to a file finished its line"""
+    with open(path, 'rb') as f:
+        f.seek(0, os.SEEK_END)
+        if f.tell() == 0:
+            return True
+        f.seek(-1, os.SEEK_END)
+        return f.read(1) == b'\n'
+
+
+def run_sweep(points, output, replications=20, seed=0, processes=None, backend='python',
+              max_ticks=100000):
+    """Run a sweep, appending rows for each finished point to a CSV; resumes from existing output"""
+    completed = load_completed(output, replications)
+    # Random draws can repeat a point; each is run once
+    todo = {}
+    for point in points:
+        key = point_id(point)
+        if key not in completed:
+            todo.setdefault(key, point)
+    todo = list(todo.values())
+
+    new_file = not os.path.exists(output) or not os.path.getsize(output)
+    with open(output, 'a', newline='') as f:
+        writer = csv.DictWriter(f, fieldnames=COLUMNS)
+        if new_file:
+            writer.writeheader()
+            f.flush()
+            os.fsync(f.fileno())
+
+        def write_point(rows):
+            writer.writerows(rows)
+            f.flush()
+            os.fsync(f.fileno())
+
+        if processes == 1:
+            for point in todo:
+                write_point(run_point(point, replications, seed, backend, max_ticks))
+        else:
+            with ProcessPoolExecutor(max_workers=processes) as executor:
+                futures = [executor.submit(run_point, point, replications, seed, backend, max_ticks)
+                           for point in todo]
+                for future in as_completed(futures):
+                    write_point(future.result())
+    return len(todo)
+
+
+def to_npz(csv_path, npz_path):
+    """Convert a sweep CSV into a columnar NumPy .npz archive, one array per column"""
+    import numpy as np
+
+    with open(csv_path, newline='') as f:
+        reader = csv.DictReader(f)
+        columns = {name: [] for name in reader.fieldnames}
+        for row in reader:
+            for name, value in row.items():
+                columns[name].append(value)
+
+    arrays = {}
+    for name, values in columns.items():
+        if name == 'point_id':
+            arrays[name] = np.array(values)
+        elif name in ('clear_time', 'mean_crossing_time', 'initial_eta'):
+            arrays[name] = np.array([float(v) if v else math.nan for v in values])
+        elif name == 'seed':
+            arrays[name] = np.array([int(v) for v in values], dtype=np.uint64)
+        else:
+            arrays[name] = np.array([int(v) for v in values], dtype=np.int64)
+    np.savez_compressed(npz_path, **arrays)
+
+
+def parse_values(spec, parameters=SWEEP_PARAMETERS):
+    """Parse 'name=1,2,3' into a list or 'name=low:high' into an inclusive range tuple"""
+    name, _, values = spec.partition('=')
+    if name not in parameters:
+        raise argparse.ArgumentTypeError(f"Unknown parameter: {name}")
+    if ':' in values:
+        low, high = values.split(':')
+        return name, (int(low), int(high))
+    return name, [int(v) for v in values.split(',')]
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Sweep queue engine parameters")
+    mode = parser.add_mutually_exclusive_group(required=True)
+    mode.add_argument('--grid', nargs='+', type=parse_values, metavar='NAME=V1,V2')
+    mode.add_argument('--random', type=int, metavar='POINTS')
+    parser.add_argument('ranges', nargs='*', type=parse_values, metavar='NAME=LOW:HIGH',
+                        help="Parameter ranges for --random")
+    parser.add_argument('--replications', type=int, default=20)
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--processes', type=int, default=None)
+    parser.add_argument('--backend', default='python')
+    parser.add_argument('--output', default='sweep.csv')
+    parser.add_argument('--npz', default=None, help="Also write a columnar .npz copy")
+    args = parser.parse_args(argv)
+
+    if args.grid:
+        grid = {}
+        for name, values in args.grid:
+            grid[name] = list(range(values[0], values[1] + 1)) if isinstance(values, tuple) else values
+        points = list(grid_points(grid))
+    else:
+        points = list(random_points(dict(args.ranges), args.random, args.seed))
+
+    ran = run_sweep(points, args.output, args.replications, args.seed, args.processes, args.backend)
+    distinct = len({point_id(point) for point in points})
+    print(f"Ran {ran} of {distinct} distinct points ({distinct - ran} already complete) -> {args.output}")
+    if args.npz:
+        to_npz(args.output, args.npz)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,94 @@
+"""Streaming run traces as newline-delimited JSON or fixed-width binary records
+
+A trace is either one record per tick (`ticks`) or one record per crossed truck
+(`events`). Writers only ever hold the current record, so traces of any length can
+be piped to a file or another process:
+
+    with open_output('-', buffer_size=1 << 20) as out:
+        writer = BinaryTraceWriter(out, 'events')
+        for result in engine.iter_until_empty():
+            writer.write(result)
+
+Binary traces start with HEADER (magic, format version, trace kind, record size)
+followed by little-endian int64 records, TICK_RECORD or EVENT_RECORD.
+"""
+import io
+import json
+import struct
+import sys
+
+MAGIC = b'BQTR'
+VERSION = 1
+KINDS = ('ticks', 'events')
+FORMATS = ('ndjson', 'binary')
+# Magic, format version, trace kind (index into KINDS) and record size
+HEADER = struct.Struct('<4sHBxI')
+# tick, time_elapsed, trucks crossed this tick, trucks crossed so far, trucks in queue
+TICK_RECORD = struct.Struct('<5q')
+# tick, time_elapsed, id of the crossed truck
+EVENT_RECORD = struct.Struct('<3q')
+RECORDS = {'ticks': TICK_RECORD, 'events': EVENT_RECORD}
+
+
+class NdjsonTraceWriter:
+    """Writes each tick result, or each crossing in it, as one JSON line"""
+
+    def __init__(self, file, kind='ticks'):
+        self.file = file
+        self.kind = kind
+
+    def write(self, result):
+        if self.kind == 'ticks':
+            self.file.write((json.dumps(result) + "\n").encode())
+            return
+        for truck_id in result['crossed_ids']:
+            self.file.write((json.dumps({'tick': result['tick'],
+                                         'time_elapsed': result['time_elapsed'],
+                                         'truck_id': truck_id}) + "\n").encode())
+
+
+class BinaryTraceWriter:
+    """Writes each tick result, or each crossing in it, as a fixed-width record"""
+
+    def __init__(self, file, kind='ticks'):
+        self.file = file
+        self.kind = kind
+        self.record = RECORDS[kind]
+        file.write(HEADER.pack(MAGIC, VERSION, KINDS.index(kind), self.record.size))
+
+    def write(self, result):
+        if self.kind == 'ticks':
+            self.file.write(TICK_RECORD.pack(
+                result['tick'], result['time_elapsed'], len(result['crossed_ids']),
+                result['trucks_crossed'], result['trucks_in_queue']))
+            return
+        for truck_id in result['crossed_ids']:
+            self.file.write(EVENT_RECORD.pack(result['tick'], result['time_elapsed'], truck_id))
+
+
+WRITERS = {'ndjson': NdjsonTraceWriter, 'binary': BinaryTraceWriter}
+
+
+def open_output(path, buffer_size=io.DEFAULT_BUFFER_SIZE):
+    """Open a buffered binary output file; '-' is standard output"""
+    if path == '-':
+        return open(sys.stdout.fileno(), 'wb', buffering=buffer_size, closefd=False)
+    return open(path, 'wb', buffering=buffer_size)
+
+
+def read_binary(file):
+    """Read a binary trace header; return its kind and an iterator over its records as tuples"""
+    magic, version, kind, record_size = HEADER.unpack(file.read(HEADER.size))
+    if magic != MAGIC or version != VERSION:
+        raise ValueError("Not a queue trace (or an unsupported version)")
+    kind = KINDS[kind]
+    return kind, _iter_records(file, RECORDS[kind])
+
+
+def _iter_records(file, record, records_per_read=4096):
+    while True:
+        chunk = file.read(record.size * records_per_read)
+        if not chunk:
+            return
+        # A trace cut off mid-write ends with a partial record, which is dropped
+        yield from record.iter_unpack(chunk[:len(chunk) - len(chunk) % record.size])
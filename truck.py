@@ -0,0 +1,42 @@
+from enum import IntEnum
+
+
+class TruckState(IntEnum):
+    """What a truck is doing; colours are derived from this only when drawing"""
+    MOVING = 0
+    STATIC = 1     # stuck, waiting for enough free space ahead to start its countdown
+    COUNTDOWN = 2  # stuck, counting down static_remaining before it can move again
+
+
+MOVING, STATIC, COUNTDOWN = TruckState.MOVING, TruckState.STATIC, TruckState.COUNTDOWN
+
+
+class Truck:
+    """Compact per-truck record: fixed attribute slots instead of a dict per truck"""
+    __slots__ = ('id', 'position', 'state', 'static_remaining', 'original_position', 'wait_time')
+
+    def __init__(self, truck_id, position, static_remaining=0, state=None, wait_time=0,
+                 original_position=None):
+        self.id = truck_id
+        self.position = position
+        self.state = (STATIC if static_remaining > 0 else MOVING) if state is None else state
+        self.static_remaining = static_remaining
+        self.original_position = position if original_position is None else original_position
+        self.wait_time = wait_time
+
+    @property
+    def is_static(self):
+        return self.state != MOVING
+
+    @property
+    def countdown_active(self):
+        return self.state == COUNTDOWN
+
+    def copy(self):
+        """Return an independent copy of the record"""
+        return Truck(self.id, self.position, self.static_remaining, self.state, self.wait_time,
+                     self.original_position)
+
+    def __repr__(self):
+        return (f"Truck(id={self.id}, position={self.position}, state={self.state.name}, "
+                f"static_remaining={self.static_remaining}, wait_time={self.wait_time})")